@@ -0,0 +1,108 @@
+"""Average questions asked by the adaptive quiz vs. answering every question
+
+Simulates users on the real quiz and on larger synthetic question banks,
+and checks that the adaptive result always matches the full quiz. Random
+users answer uniformly at random; consistent users have a personality
+and pick the option that suits it best with probability --consistency.
+
+Usage: python benchmarks/bench_adaptive_quiz.py [--users 5000] [--bank-sizes 10,20,40] [--consistency 0.7]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_engine import PERSONALITIES, QUIZ, ScoringEngine, compile_quiz  # noqa: E402
+
+
+def synthetic_bank(size, options=5, seed=0):
+    """Questions whose options each give 1-2 points to one or two personalities"""
+    rng = random.Random(seed)
+    questions = []
+    for q in range(size):
+        choices = {}
+        for o in range(options):
+            points = {}
+            for personality in rng.sample(PERSONALITIES, rng.choice((1, 2))):
+                points[personality] = rng.choice((1, 2))
+            choices[f"Question {q + 1}, option {o + 1}"] = points
+        questions.append({"question": f"Question {q + 1}?", "options": choices})
+    return compile_quiz(questions)
+
+
+def run_adaptive(engine, answers):
+    """Ask questions adaptively for a user whose answers are fixed in advance"""
+    asked = []
+    scores = np.zeros(len(engine.personalities), dtype=np.int32)
+    while True:
+        question = engine.next_question(scores, asked)
+        if question is None:
+            break
+        asked.append(question)
+        scores = engine.partial_scores(asked, [answers[q] for q in asked])
+        if engine.is_decided(scores, asked):
+            break
+    return engine.personalities[engine.leader(scores)], len(asked)
+
+
+def simulated_answers(quiz, rng, consistency):
+    if not consistency:
+        return [rng.choice(question.options) for question in quiz.questions]
+    personality = rng.randrange(len(quiz.personalities))
+    answers = []
+    for question in quiz.questions:
+        if rng.random() < consistency:
+            best = max(range(len(question.options)), key=lambda o: question.points[o][personality])
+            answers.append(question.options[best])
+        else:
+            answers.append(rng.choice(question.options))
+    return answers
+
+
+def bench(name, quiz, users, seed, consistency=0.0):
+    engine = ScoringEngine(quiz)
+    rng = random.Random(seed)
+    asked = []
+    mismatches = 0
+    started = time.perf_counter()
+    for _ in range(users):
+        answers = simulated_answers(quiz, rng, consistency)
+        result, count = run_adaptive(engine, answers)
+        mismatches += result != engine.calculate(answers)
+        asked.append(count)
+    elapsed = time.perf_counter() - started
+    total = engine.num_questions
+    average = sum(asked) / len(asked)
+    users_kind = f"consistent {consistency:.0%}" if consistency else "random"
+    print(f"{name:15} {users_kind:15} {total:>4} questions  adaptive asks {average:6.2f} on average "
+          f"({100 * (1 - average / total):4.1f}% fewer reruns), min {min(asked)}, max {max(asked)}, "
+          f"{mismatches} mismatches, {1e3 * elapsed / users:.2f} ms/user")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--bank-sizes", default="10,20,40")
+    parser.add_argument("--consistency", type=float, default=0.7)
+    args = parser.parse_args()
+
+    quizzes = [("music quiz", QUIZ)] + [
+        ("synthetic bank", synthetic_bank(int(size), seed=int(size)))
+        for size in args.bank_sizes.split(",") if size
+    ]
+    mismatches = 0
+    for consistency in (0.0, args.consistency):
+        for seed, (name, quiz) in enumerate(quizzes, start=1):
+            mismatches += bench(name, quiz, args.users, seed, consistency)
+    if mismatches:
+        sys.exit("Adaptive results differ from the full quiz")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Rerun-latency benchmarks for the three Streamlit apps, driven through AppTest
+
+For each size the apps are seeded (N tasks, N chat messages, or N full
+quiz runs) and a fixed set of widget interactions is replayed headlessly.
+Every rerun records wall time, the number of elements in the rendered
+tree and the peak Python memory traced during the run. Results are
+written as JSON so runs can be compared after the apps change.
+
+Usage: python benchmarks/bench_apps.py [--sizes 10,1000,10000] [--output app_bench.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from chat_history import ChatHistory, summarize_turn  # noqa: E402
+from task_store import TaskStore, PRIORITIES, CATEGORIES  # noqa: E402
+
+RUN_TIMEOUT = 120
+
+
+def count_elements(node):
+    children = getattr(node, "children", None) or {}
+    return 1 + sum(count_elements(child) for child in children.values())
+
+
+def timed_run(at, results, app, size, step):
+    """Rerun the app once and record one result row"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    at.run(timeout=RUN_TIMEOUT)
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if at.exception:
+        raise RuntimeError(f"{app} raised during '{step}': {at.exception[0].value}")
+    row = {
+        "app": app,
+        "size": size,
+        "step": step,
+        "wall_ms": round(wall * 1e3, 2),
+        "elements": count_elements(at._tree),
+        "peak_kb": round(peak / 1024, 1),
+    }
+    results.append(row)
+    print(f"{app:14} {size:>7} {step:24} {row['wall_ms']:>10.1f} ms {row['elements']:>7} el "
+          f"{row['peak_kb']:>10.0f} KB", flush=True)
+
+
+def click(at, label_prefix):
+    for button in at.button:
+        if button.label.startswith(label_prefix):
+            button.click()
+            return
+    raise LookupError(f"No button starting with {label_prefix!r}")
+
+
+def bench_todolist(size, results, tmp):
+    db_path = os.path.join(tmp, f"todos_{size}.db")
+    store = TaskStore(db_path)
+    rng = random.Random(size)
+    store.add_many(
+        {
+            "task": f"Benchmark task {i}",
+            "priority": rng.choice(PRIORITIES),
+            "category": rng.choice(CATEGORIES),
+            "completed": rng.random() < 0.3,
+            "cat_emoji": "🐱",
+        }
+        for i in range(size)
+    )
+    store.close()
+    os.environ["CAT_TODO_DB"] = db_path
+    os.environ["CAT_TODO_EXPORT_DIR"] = os.path.join(tmp, "exports")
+
+    at = AppTest.from_file(os.path.join(APP_DIR, "cat_todolist.py"), default_timeout=RUN_TIMEOUT)
+    timed_run(at, results, "cat_todolist", size, "initial load")
+
+    row_checkboxes = [box for box in at.checkbox if box.key and box.key.startswith("todo_")]
+    row_checkboxes[0].set_value(not row_checkboxes[0].value)
+    timed_run(at, results, "cat_todolist", size, "toggle task")
+
+    delete_buttons = [button for button in at.button if button.key and button.key.startswith("delete_")]
+    delete_buttons[0].click()
+    timed_run(at, results, "cat_todolist", size, "delete task")
+
+    show_completed = [box for box in at.sidebar.checkbox if box.label == "Show completed tasks"][0]
+    show_completed.uncheck()
+    timed_run(at, results, "cat_todolist", size, "filter open tasks")
+
+    next_buttons = [button for button in at.button if button.key == "page_next"]
+    if next_buttons:
+        next_buttons[0].click()
+        timed_run(at, results, "cat_todolist", size, "next page")
+
+    if any(button.label.startswith("🧹") for button in at.button):
+        click(at, "🧹")
+        timed_run(at, results, "cat_todolist", size, "delete completed")
+
+
+def bench_chatbot(size, results, tmp):
+    os.environ.setdefault("CHAT_BACKEND", "fake")
+    os.environ.setdefault("CHAT_FAKE_LATENCY", "0")
+    os.environ.setdefault("CHAT_FAKE_TOKENS_PER_SECOND", "0")
+    os.environ["CHAT_LOG_DIR"] = os.path.join(tmp, "chat_logs")
+    at = AppTest.from_file(os.path.join(APP_DIR, "chatbot.py"), default_timeout=RUN_TIMEOUT)
+    history = ChatHistory(os.path.join(tmp, f"chat_{size}.ndjson"), summarizer=summarize_turn)
+    for i in range(size):
+        history.append({"role": "user" if i % 2 == 0 else "assistant", "content": f"Benchmark message {i}"})
+    at.session_state["history"] = history
+    timed_run(at, results, "chatbot", size, "initial load")
+    for turn in range(3):
+        at.chat_input[0].set_value(f"Hello number {turn}")
+        timed_run(at, results, "chatbot", size, f"chat input {turn + 1}")
+
+
+def bench_quiz(size, results, tmp):
+    # The quiz does not grow with data, so "size" is the number of full runs through it
+    rng = random.Random(size)
+    os.environ["QUIZ_ANALYTICS_PATH"] = os.path.join(tmp, "quiz_analytics.json")
+    at = AppTest.from_file(os.path.join(APP_DIR, "music_quiz.py"), default_timeout=RUN_TIMEOUT)
+    timed_run(at, results, "music_quiz", size, "welcome")
+    for run in range(size):
+        click(at, "🚀 Start")
+        timed_run(at, results, "music_quiz", size, "start quiz")
+        question = 0
+        while at.radio:
+            radio = at.radio[0]
+            radio.set_value(rng.choice(radio.options))
+            click(at, "Next Question")
+            question += 1
+            timed_run(at, results, "music_quiz", size, f"next question {question}")
+        click(at, "🔄 Take Quiz Again")
+        timed_run(at, results, "music_quiz", size, "restart")
+
+
+BENCHMARKS = {
+    "cat_todolist": bench_todolist,
+    "chatbot": bench_chatbot,
+    "music_quiz": bench_quiz,
+}
+
+
+def summarize(results):
+    """Median wall time, elements and peak memory per (app, size, step)"""
+    groups = {}
+    for row in results:
+        groups.setdefault((row["app"], row["size"], row["step"]), []).append(row)
+    summary = []
+    for (app, size, step), rows in groups.items():
+        walls = sorted(row["wall_ms"] for row in rows)
+        summary.append({
+            "app": app,
+            "size": size,
+            "step": step,
+            "runs": len(rows),
+            "median_wall_ms": walls[len(walls) // 2],
+            "elements": max(row["elements"] for row in rows),
+            "peak_kb": max(row["peak_kb"] for row in rows),
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,10000",
+                        help="comma-separated tasks / messages per run (default: 10,1000,10000)")
+    parser.add_argument("--quiz-runs", type=int, default=3,
+                        help="full quiz runs per size (the quiz itself does not scale)")
+    parser.add_argument("--apps", default=",".join(BENCHMARKS),
+                        help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", default="app_bench.json", help="where to write the JSON results")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    apps = [app for app in args.apps.split(",") if app]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for app in apps:
+            for size in sizes:
+                if app == "music_quiz":
+                    BENCHMARKS[app](args.quiz_runs, results, tmp)
+                    break
+                BENCHMARKS[app](size, results, tmp)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "summary": summarize(results),
+        "runs": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {len(results)} measurements to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Time loading a large music catalog: first parse of the CSV vs. the memory-mapped cache
+
+Usage: python benchmarks/bench_catalog.py [--tracks 1000000]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music_catalog import CATALOG_COLUMNS, RecommendationIndex, read_catalog  # noqa: E402
+from quiz_engine import PERSONALITIES  # noqa: E402
+
+GENRES = ["Electronic", "Lo-fi", "Pop", "R&B", "Punk Rock", "Jazz Fusion", "Ambient",
+          "Dance", "Soul", "Metal", "Indie Folk", "Hip-Hop", "World Music", "Grunge"]
+
+
+def write_catalog(path, count):
+    rng = random.Random(0)
+    artists = [f"Artist {i}" for i in range(max(1, count // 20))]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CATALOG_COLUMNS + PERSONALITIES)
+        for i in range(count):
+            writer.writerow([f"Track {i}", rng.choice(artists), rng.choice(GENRES)]
+                            + [round(rng.random(), 3) for _ in PERSONALITIES])
+
+
+def timed_load(path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = RecommendationIndex(read_catalog(path))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return index, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.csv")
+        started = time.perf_counter()
+        write_catalog(path, args.tracks)
+        print(f"Wrote {args.tracks:,} tracks ({os.path.getsize(path) / 1e6:.0f} MB) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        index, cold, cold_peak = timed_load(path)
+        print(f"First load (parse CSV + write cache): {cold:.2f}s, peak {cold_peak / 1e6:.0f} MB")
+        index, warm, warm_peak = timed_load(path)
+        print(f"Cached load (memory-mapped arrays):   {warm:.2f}s, peak {warm_peak / 1e6:.0f} MB")
+        print(f"Speedup: {cold / warm:.1f}x")
+        print("Sample:", index.recommend(PERSONALITIES[0], random.Random(1)))
+
+
+if __name__ == "__main__":
+    main()
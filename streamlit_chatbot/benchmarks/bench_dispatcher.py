@@ -0,0 +1,177 @@
+"""Load generator for the chat dispatcher against the local fake backend
+
+Simulated sessions each send a few prompts with some think time between
+them; some are drawn from a small skewed pool so popular prompts
+overlap, the rest are unique. Every
+request records its queue wait, time to first token and total time. The
+same load is run with each session calling the backend directly (one
+thread per reply, no limit) and through the Dispatcher, to compare the
+latency percentiles against the number of model calls actually made and
+how many ran at once.
+
+Usage: python benchmarks/bench_dispatcher.py [--sessions 200] [--workers 8] [--rate 0]
+"""
+import argparse
+import os
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_backends import ChatBackend, FakeBackend  # noqa: E402
+from chat_dispatcher import Dispatcher  # noqa: E402
+
+_DONE = object()
+
+
+def stream_in_background(backend, messages, cancel=None):
+    """Run backend.stream on a worker thread and yield its chunks as they arrive
+
+    How a session calls the backend without the dispatcher: one thread per
+    reply and no limit. Closing the generator, or setting `cancel`, stops
+    the worker. Backend errors are re-raised here.
+    """
+    cancel = cancel or threading.Event()
+    chunks = queue.Queue()
+    history = list(messages)
+
+    def produce():
+        try:
+            for chunk in backend.stream(history, cancel):
+                if cancel.is_set():
+                    break
+                chunks.put(chunk)
+        except Exception as e:  # Handed to the consumer, which re-raises it
+            chunks.put(e)
+        finally:
+            chunks.put(_DONE)
+
+    worker = threading.Thread(target=produce, name=f"chat-{backend.name}", daemon=True)
+    worker.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        cancel.set()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+
+class CountingBackend(ChatBackend):
+    """Counts calls to, and peak concurrency of, the wrapped backend"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def stream(self, messages, cancel):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            yield from self.backend.stream(messages, cancel)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def session(send, session_id, args, samples):
+    rng = random.Random(session_id)
+    time.sleep(rng.random() * args.ramp)
+    for _ in range(args.turns):
+        if rng.random() < args.popular:
+            prompt = f"Question {int(rng.paretovariate(1.2)) % args.prompts}"
+        else:
+            prompt = f"Question from session {session_id}: {rng.random()}"
+        messages = [{"role": "user", "content": prompt}]
+        started = time.perf_counter()
+        first = None
+        for _ in send(session_id, messages, started, samples):
+            if first is None:
+                first = time.perf_counter() - started
+        samples["first"].append(first)
+        samples["total"].append(time.perf_counter() - started)
+        time.sleep(rng.random() * args.think)
+
+
+def run(args, mode):
+    backend = CountingBackend(FakeBackend(args.latency, args.tokens_per_second, jitter=0.2))
+    samples = {"first": [], "total": [], "wait": []}
+    dispatcher = None
+
+    if mode == "direct":
+        def send(session_id, messages, started, samples):
+            samples["wait"].append(0.0)
+            yield from stream_in_background(backend, messages)
+    else:
+        dispatcher = Dispatcher(backend, workers=args.workers, rate=args.rate, burst=args.workers)
+
+        def send(session_id, messages, started, samples):
+            ticket = dispatcher.submit(session_id, messages)
+            ticket.wait_started()
+            samples["wait"].append(time.perf_counter() - started)
+            yield from ticket.stream()
+
+    threads = [
+        threading.Thread(target=session, args=(send, i, args, samples)) for i in range(args.sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    requests = len(samples["total"])
+    print(f"{mode}:")
+    print(f"  requests:      {requests} in {elapsed:.2f}s ({requests / elapsed:.0f}/s)")
+    print(f"  model calls:   {backend.calls} (peak {backend.peak} at once)")
+    if dispatcher is not None:
+        print(f"  coalesced:     {dispatcher.stats()['coalesced']}")
+        dispatcher.close()
+    for name in ("wait", "first", "total"):
+        values = samples[name]
+        print(f"  {name + ':':14} p50 {statistics.median(values) * 1e3:7.0f} ms, "
+              f"p99 {percentile(values, 99) * 1e3:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3, help="prompts per session")
+    parser.add_argument("--prompts", type=int, default=50, help="distinct popular prompts")
+    parser.add_argument("--popular", type=float, default=0.5, help="share of prompts drawn from the popular ones")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0, help="model calls per second, 0 = unlimited")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=30)
+    parser.add_argument("--ramp", type=float, default=2.0, help="sessions start within this many seconds")
+    parser.add_argument("--think", type=float, default=1.0, help="max pause between a session's prompts (s)")
+    parser.add_argument("--modes", default="direct,dispatcher")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.turns} prompts, {args.workers} workers, "
+          f"rate {args.rate or 'unlimited'}")
+    for mode in args.modes.split(","):
+        run(args, mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Query latency and recall of exact vs. IVF nearest-neighbour song search
+
+Usage: python benchmarks/bench_neighbors.py [--tracks 500000] [--queries 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music_neighbors import ExactIndex, IVFIndex, normalize  # noqa: E402
+from quiz_engine import PERSONALITIES  # noqa: E402
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    features = normalize(rng.random((args.tracks, len(PERSONALITIES)), dtype=np.float32) ** 3)
+    # Quiz score vectors are small non-negative integers
+    queries = rng.integers(0, 9, (args.queries, len(PERSONALITIES))).astype(np.float32)
+
+    exact = ExactIndex(features)
+    started = time.perf_counter()
+    ivf = IVFIndex(features)
+    print(f"{args.tracks:,} tracks, IVF build {time.perf_counter() - started:.2f}s "
+          f"({len(ivf.centroids)} lists, probing {ivf.n_probe})")
+
+    timings = {"exact": [], "ivf": []}
+    recall = []
+    for query in queries:
+        started = time.perf_counter()
+        expected, _ = exact.search(query, args.k)
+        timings["exact"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        found, _ = ivf.search(query, args.k)
+        timings["ivf"].append(time.perf_counter() - started)
+        recall.append(len(set(expected.tolist()) & set(found.tolist())) / args.k)
+
+    for name, samples in timings.items():
+        print(f"{name:6} p50 {percentile_ms(samples, 50):7.2f} ms   p99 {percentile_ms(samples, 99):7.2f} ms")
+    print(f"IVF recall@{args.k}: {np.mean(recall):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Check ScoringEngine against the original if/elif quiz scoring, and time both
+
+Every combination of answers to the real quiz (5^4 = 625) is scored by
+the hand-written if/elif chain the app used before the weight matrix and
+by ScoringEngine, one answer set at a time and as one batch. The
+personalities and the per-personality scores must agree everywhere.
+Exits non-zero on any mismatch.
+
+Usage: python benchmarks/bench_quiz_scoring.py [--repeat 20]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_engine import PERSONALITIES, QUIZ, ScoringEngine  # noqa: E402
+
+
+def reference_scores(answers):
+    """The original calculate_personality scoring, kept verbatim apart from returning the scores"""
+    scores = {
+        "adventurous": 0,
+        "chill": 0,
+        "energetic": 0,
+        "romantic": 0,
+        "rebellious": 0
+    }
+
+    # Question 1: Weekend activity
+    if answers[0] == "Try a new adventure sport":
+        scores["adventurous"] += 2
+    elif answers[0] == "Read a book in a quiet café":
+        scores["chill"] += 2
+    elif answers[0] == "Go to a party or club":
+        scores["energetic"] += 2
+    elif answers[0] == "Have a romantic dinner":
+        scores["romantic"] += 2
+    elif answers[0] == "Attend a rock concert":
+        scores["rebellious"] += 2
+
+    # Question 2: Color preference
+    if answers[1] == "Bright Orange":
+        scores["adventurous"] += 1
+        scores["energetic"] += 1
+    elif answers[1] == "Soft Blue":
+        scores["chill"] += 2
+    elif answers[1] == "Electric Purple":
+        scores["energetic"] += 1
+        scores["rebellious"] += 1
+    elif answers[1] == "Warm Pink":
+        scores["romantic"] += 2
+    elif answers[1] == "Deep Black":
+        scores["rebellious"] += 2
+
+    # Question 3: Movie genre
+    if answers[2] == "Action/Adventure":
+        scores["adventurous"] += 1
+        scores["energetic"] += 1
+    elif answers[2] == "Drama/Indie":
+        scores["chill"] += 2
+    elif answers[2] == "Comedy":
+        scores["energetic"] += 2
+    elif answers[2] == "Romance":
+        scores["romantic"] += 2
+    elif answers[2] == "Horror/Thriller":
+        scores["rebellious"] += 2
+
+    # Question 4: Social setting
+    if answers[3] == "Large group party":
+        scores["energetic"] += 2
+    elif answers[3] == "Small intimate gathering":
+        scores["romantic"] += 1
+        scores["chill"] += 1
+    elif answers[3] == "Solo time":
+        scores["chill"] += 2
+    elif answers[3] == "Underground venue":
+        scores["rebellious"] += 2
+    elif answers[3] == "Outdoor adventure":
+        scores["adventurous"] += 2
+
+    return scores
+
+
+def reference_personality(answers):
+    scores = reference_scores(answers)
+    return max(scores, key=scores.get)
+
+
+def timed(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="timing runs per method")
+    args = parser.parse_args()
+
+    engine = ScoringEngine()
+    combos = list(itertools.product(*(question.options for question in QUIZ.questions)))
+    problems = 0
+
+    batch_winners = engine.classify(engine.encode_batch(combos))
+    batch_scores = engine.scores(engine.encode_batch(combos))
+    for i, answers in enumerate(combos):
+        expected = reference_scores(answers)
+        winner = reference_personality(answers)
+        got = dict(zip(PERSONALITIES, map(int, batch_scores[i])))
+        if got != expected:
+            problems += 1
+            print(f"scores differ for {answers}: {got} != {expected}")
+        if engine.calculate(answers) != winner or PERSONALITIES[batch_winners[i]] != winner:
+            problems += 1
+            print(f"personality differs for {answers}: expected {winner}")
+
+    _, reference_time = timed(lambda: [reference_personality(answers) for answers in combos], args.repeat)
+    _, single_time = timed(lambda: [engine.calculate(answers) for answers in combos], args.repeat)
+    choices = engine.encode_batch(combos)
+    _, batch_time = timed(lambda: engine.classify(choices), args.repeat)
+
+    print(f"{len(combos)} answer combinations, {problems} mismatches")
+    for name, seconds in (("if/elif", reference_time), ("engine, one by one", single_time),
+                          ("engine, batch", batch_time)):
+        print(f"  {name + ':':20} {seconds * 1e3:8.3f} ms ({seconds / len(combos) * 1e6:.2f} us per answer set)")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Hammer one shared TaskStore from many threads plus a second connection
+
+Each worker thread mixes page reads with adds, toggles (using the rev it
+read, so stale ones conflict), edits and deletes; meanwhile an "external"
+store on the same file stands in for another server process. At the end
+both mirrors are checked against the database and the indexes and stats
+against a recount. Exits non-zero if anything disagrees.
+
+Usage: python benchmarks/bench_store_concurrency.py [--threads 16] [--ops 500]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_store import TaskStore, ConflictError, PRIORITIES, CATEGORIES  # noqa: E402
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+
+def worker(store, ops, seed, reads, writes, counts):
+    rng = random.Random(seed)
+    for _ in range(ops):
+        roll = rng.random()
+        if roll < 0.5:
+            start = time.perf_counter()
+            store.page(show_completed=rng.random() < 0.5, limit=20)
+            reads.append(time.perf_counter() - start)
+            continue
+        start = time.perf_counter()
+        try:
+            page, _, _ = store.page(limit=50)
+            if roll < 0.7 or not page:
+                store.add(f"task {rng.random():.6f}", rng.choice(PRIORITIES),
+                          rng.choice(CATEGORIES), "🐱")
+            else:
+                todo = rng.choice(page)
+                rev = todo.rev
+                if roll < 0.85:
+                    store.set_completed(todo.id, not todo["completed"], expected_rev=rev)
+                elif roll < 0.95:
+                    store.update(todo.id, expected_rev=rev, priority=rng.choice(PRIORITIES))
+                else:
+                    store.delete(todo.id, expected_rev=rev)
+            counts["ok"] += 1
+        except ConflictError:
+            counts["conflicts"] += 1
+        writes.append(time.perf_counter() - start)
+
+
+def check(store, path):
+    """Compare a store's mirror, indexes and stats with the database"""
+    conn = sqlite3.connect(path)
+    rows = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT id, task, priority, category, completed, rev FROM tasks WHERE list_name = ?",
+            (store.list_name,),
+        )
+    }
+    conn.close()
+    problems = []
+    mirror = {todo.id: (todo["task"], todo["priority"], todo["category"], int(todo["completed"]), todo.rev)
+              for todo in store.all()}
+    if mirror != rows:
+        problems.append(f"mirror differs from database ({len(mirror)} vs {len(rows)} tasks)")
+    stats = store.get_stats()
+    if stats.total != len(rows) or stats.completed != sum(row[3] for row in rows.values()):
+        problems.append("stats totals do not match")
+    if stats.by_category != Counter(row[2] for row in rows.values()):
+        problems.append("category counters do not match")
+    if len(store.index.order) != len(rows) or store.index.completed | store.index.open != set(rows):
+        problems.append("indexes do not cover exactly the stored tasks")
+    if store.text_index.terms.keys() != rows.keys():
+        problems.append("search index does not cover exactly the stored tasks")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=500, help="operations per thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        shared = TaskStore(path)
+        external = TaskStore(path)
+        reads, writes = [], []
+        counts = Counter()
+
+        threads = [
+            threading.Thread(target=worker, args=(shared, args.ops, seed, reads, writes, counts))
+            for seed in range(args.threads)
+        ]
+        threads.append(threading.Thread(
+            target=worker, args=(external, args.ops, -1, [], [], Counter())
+        ))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        shared.refresh()
+        external.refresh()
+        problems = check(shared, path) + check(external, path)
+
+        total_ops = (args.threads + 1) * args.ops
+        print(f"threads:        {args.threads} shared + 1 external connection")
+        print(f"operations:     {total_ops} in {elapsed:.2f}s ({total_ops / elapsed:.0f} ops/s)")
+        print(f"writes:         {counts['ok']} ok, {counts['conflicts']} optimistic conflicts")
+        print(f"read latency:   p50 {statistics.median(reads) * 1e3:.2f} ms, p99 {percentile(reads, 99) * 1e3:.2f} ms")
+        print(f"write latency:  p50 {statistics.median(writes) * 1e3:.2f} ms, p99 {percentile(writes, 99) * 1e3:.2f} ms")
+        print(f"final tasks:    {len(shared)} (list version {shared.version})")
+        for problem in problems:
+            print(f"MISMATCH: {problem}")
+        shared.close()
+        external.close()
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compare per-session memory of plain task dicts with compact TaskRecord objects
+
+Usage: python benchmarks/bench_task_memory.py [--tasks 100000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_records import TaskRecord  # noqa: E402
+from task_store import TaskStore, PRIORITIES, CATEGORIES  # noqa: E402
+
+CAT_EMOJIS = ["🐱", "😸", "😹", "😻", "😼", "😽", "🙀", "😿", "😾"]
+
+
+def seed_database(path, count):
+    store = TaskStore(path)
+    store.add_many(
+        {
+            "task": f"Feed the cat, round {i}",
+            "priority": random.choice(PRIORITIES),
+            "category": random.choice(CATEGORIES),
+            "completed": random.random() < 0.3,
+            "created_at": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d} 12:{i % 60:02d}:{i % 60:02d}",
+            "cat_emoji": random.choice(CAT_EMOJIS),
+        }
+        for i in range(count)
+    )
+    store.close()
+
+
+def measure(path, build):
+    """Peak traced bytes while holding every row in the given representation"""
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        "SELECT id, task, priority, category, completed, created_at, cat_emoji, completed_at "
+        "FROM tasks ORDER BY id"
+    )
+    tracemalloc.start()
+    tasks = {}
+    for row in rows:
+        tasks[row[0]] = build(row)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    conn.close()
+    return current, len(tasks)
+
+
+def as_dict(row):
+    # The session-state layout the app used before TaskRecord
+    return {
+        "id": row[0],
+        "task": row[1],
+        "priority": row[2],
+        "category": row[3],
+        "completed": bool(row[4]),
+        "created_at": row[5],
+        "cat_emoji": row[6],
+        "completed_at": row[7],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed_database(path, args.tasks)
+        dict_bytes, count = measure(path, as_dict)
+        record_bytes, _ = measure(path, lambda row: TaskRecord(*row))
+
+    print(f"tasks:          {count}")
+    print(f"dict per task:  {dict_bytes / count:8.1f} bytes  ({dict_bytes / 1e6:.1f} MB total)")
+    print(f"TaskRecord:     {record_bytes / count:8.1f} bytes  ({record_bytes / 1e6:.1f} MB total)")
+    print(f"reduction:      {dict_bytes / record_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,27 @@
 import streamlit as st
-import json
+import os
+import re
 import base64
+import sqlite3
 from datetime import datetime
 import requests
 from io import BytesIO
 import time
+from task_store import TaskStore, ConflictError, DEFAULT_LIST, PRIORITIES, CATEGORIES
+from task_import import import_tasks
+from task_search import MIN_PREFIX, is_searchable
+from task_export import EXPORT_FORMATS, export_file
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get("CAT_TODO_DB", os.path.join(APP_DIR, "cat_todos.db"))
+LEGACY_TASKS_PATH = os.path.join(APP_DIR, "tasks.json")
+EXPORT_DIR = os.environ.get("CAT_TODO_EXPORT_DIR", os.path.join(APP_DIR, "exports"))
+PAGE_SIZES = [10, 20, 50, 100]
+# Lists come from the ?list= query parameter, so keep names short and the open stores bounded
+LIST_NAME = re.compile(r"[\w -]{1,40}")
+MAX_OPEN_LISTS = int(os.environ.get("CAT_TODO_MAX_OPEN_LISTS", "32"))
+# How often each session polls the list for changes made elsewhere; 0 turns polling off
+SYNC_SECONDS = float(os.environ.get("CAT_TODO_SYNC_SECONDS", "5"))
 
 # Page configuration
 st.set_page_config(
@@ -116,12 +133,25 @@ def load_css():
     </style>
     """, unsafe_allow_html=True)
 
+# One store per task list, shared by every session in this server process
+@st.cache_resource(max_entries=MAX_OPEN_LISTS)
+def get_task_store(db_path, list_name):
+    return TaskStore(db_path, list_name=list_name, migrate_from=LEGACY_TASKS_PATH)
+
 # Initialize session state
 def init_session_state():
-    if 'todos' not in st.session_state:
-        st.session_state.todos = []
+    if 'store' not in st.session_state:
+        list_name = st.query_params.get("list", DEFAULT_LIST)
+        if not LIST_NAME.fullmatch(list_name):
+            st.error("List names can only use letters, digits, spaces, \"_\" and \"-\", up to 40 characters 🐱")
+            st.stop()
+        st.session_state.store = get_task_store(DB_PATH, list_name)
+    # Pick up anything written by other processes since the last run
+    st.session_state.store.refresh()
     if 'cat_sounds' not in st.session_state:
         st.session_state.cat_sounds = True
+    if 'selected_tasks' not in st.session_state:
+        st.session_state.selected_tasks = set()
 
 # Cat sound function
 def play_meow_sound():
@@ -159,30 +189,27 @@ def add_todo():
             new_task = st.text_input("What needs to be done? 🎯", placeholder="Feed the cat, clean litter box...")
         
         with col2:
-            priority = st.selectbox("Priority", ["🔴 High", "🟡 Medium", "🟢 Low"])
+            priority = st.selectbox("Priority", PRIORITIES)
         
-        category = st.selectbox("Category", ["🏠 Personal", "💼 Work", "🛒 Shopping", "🎯 Goals", "🐱 Cat Care"])
+        category = st.selectbox("Category", CATEGORIES)
         
         submit_button = st.form_submit_button("Add Task 🐾")
         
         if submit_button and new_task:
-            todo_item = {
-                "id": len(st.session_state.todos),
-                "task": new_task,
-                "priority": priority,
-                "category": category,
-                "completed": False,
-                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "cat_emoji": get_random_cat_image()
-            }
-            st.session_state.todos.append(todo_item)
+            st.session_state.store.add(
+                task=new_task,
+                priority=priority,
+                category=category,
+                cat_emoji=get_random_cat_image()
+            )
             play_meow_sound()
             st.success("Task added! Your cat is proud! 🐱✨")
             st.rerun()
 
 # Display todos
 def display_todos():
-    if not st.session_state.todos:
+    store = st.session_state.store
+    if not len(store):
         st.markdown("""
         <div style="text-align: center; padding: 50px;">
             <h2>🐱 No tasks yet!</h2>
@@ -196,65 +223,260 @@ def display_todos():
     st.sidebar.markdown("### 🎛️ Filter Tasks")
     show_completed = st.sidebar.checkbox("Show completed tasks", value=True)
     category_filter = st.sidebar.selectbox("Filter by category", 
-                                         ["All"] + list(set([todo["category"] for todo in st.session_state.todos])))
+                                         ["All"] + store.categories())
     priority_filter = st.sidebar.selectbox("Filter by priority", 
-                                         ["All", "🔴 High", "🟡 Medium", "🟢 Low"])
+                                         ["All"] + PRIORITIES)
     
-    # Filter todos
-    filtered_todos = st.session_state.todos.copy()
+    page_size = st.sidebar.selectbox("Tasks per page", PAGE_SIZES, index=1)
     
-    if not show_completed:
-        filtered_todos = [todo for todo in filtered_todos if not todo["completed"]]
+    # Searching ranks matches first; it combines with the sidebar filters
+    search = st.text_input("🔍 Search tasks", key="search_query",
+                           placeholder="Search by any words in the task, e.g. \"litter\"").strip()
+    if search and not is_searchable(search):
+        # One letter would match most of the list, so wait for the next keystroke
+        st.caption(f"Type at least {MIN_PREFIX} letters to search 🐱")
+        search = ""
     
-    if category_filter != "All":
-        filtered_todos = [todo for todo in filtered_todos if todo["category"] == category_filter]
+    # Start again from the first page whenever the filters change
+    filters = (show_completed, category_filter, priority_filter, page_size, search)
+    if st.session_state.get('page_filters') != filters:
+        st.session_state.page_filters = filters
+        st.session_state.page_cursors = [None]
     
-    if priority_filter != "All":
-        filtered_todos = [todo for todo in filtered_todos if todo["priority"] == priority_filter]
+    query = dict(
+        show_completed=show_completed,
+        category=None if category_filter == "All" else category_filter,
+        priority=None if priority_filter == "All" else priority_filter,
+        search=search or None
+    )
     
-    # Display filtered todos
-    for i, todo in enumerate(filtered_todos):
-        with st.container():
-            col1, col2, col3, col4 = st.columns([0.5, 3, 1, 1])
-            
-            with col1:
-                st.markdown(f"<div class='cat-decoration'>{todo['cat_emoji']}</div>", unsafe_allow_html=True)
-            
-            with col2:
-                checkbox_key = f"todo_{todo['id']}"
-                completed = st.checkbox("", value=todo["completed"], key=checkbox_key)
-                
-                if completed != todo["completed"]:
-                    st.session_state.todos[todo['id']]["completed"] = completed
-                    if completed:
-                        play_meow_sound()
-                        st.balloons()
-                    st.rerun()
-                
-                task_style = "completed-item" if todo["completed"] else "todo-item"
-                st.markdown(f"""
-                <div class="{task_style}">
-                    <h4>{todo['task']}</h4>
-                    <p><strong>Priority:</strong> {todo['priority']} | <strong>Category:</strong> {todo['category']}</p>
-                    <small>Created: {todo['created_at']}</small>
-                </div>
-                """, unsafe_allow_html=True)
+    # Only the visible page is pulled from the store's indexes and rendered
+    filtered_todos, next_cursor, total_matches = store.page(
+        after=st.session_state.page_cursors[-1],
+        limit=page_size,
+        **query
+    )
+    
+    if search and not total_matches:
+        st.info(f"No tasks match \"{search}\" 🐱")
+    
+    display_bulk_actions(query, total_matches)
+    
+    # Display filtered todos, each row as its own fragment so row clicks only rerun that row
+    for todo in filtered_todos:
+        display_todo_row(todo['id'])
+    
+    display_page_navigation(len(filtered_todos), next_cursor, total_matches, page_size)
+
+# Run one of this session's writes, showing a conflict with another tab as a toast
+def write_to_store(write):
+    try:
+        write(st.session_state.store)
+    except ConflictError:
+        st.toast("That task was changed in another tab, so here's the latest version 🐱")
+        return False
+    return True
+
+# Widget callbacks run before the fragment reruns, so the row redraws from the updated store
+def toggle_todo(task_id, rev):
+    completed = st.session_state[f"todo_{task_id}"]
+    if write_to_store(lambda store: store.set_completed(task_id, completed, expected_rev=rev)) and completed:
+        st.session_state.celebrate_todo = task_id
+
+def delete_todo(task_id, rev):
+    write_to_store(lambda store: store.delete(task_id, expected_rev=rev))
+
+def toggle_selected(task_id):
+    if st.session_state[f"select_{task_id}"]:
+        st.session_state.selected_tasks.add(task_id)
+    else:
+        st.session_state.selected_tasks.discard(task_id)
+
+def select_matching(query):
+    st.session_state.selected_tasks = st.session_state.store.matching_ids(**query)
+
+def clear_selection():
+    st.session_state.selected_tasks = set()
+
+# Bulk callbacks: the whole selection is one store write, followed by the callback's one rerun
+def bulk_update_selected(done_message, **fields):
+    changed = []
+    selected = st.session_state.selected_tasks
+    if selected and write_to_store(lambda store: changed.extend(store.bulk_update(selected, **fields))):
+        st.toast(done_message.format(count=len(changed)))
+
+def bulk_delete_selected():
+    deleted = []
+    selected = st.session_state.selected_tasks
+    if selected and write_to_store(lambda store: deleted.append(store.bulk_delete(selected))):
+        st.session_state.selected_tasks = set()
+        st.toast(f"Deleted {deleted[0]} tasks 🗑️")
+
+def delete_completed():
+    deleted = []
+    if write_to_store(lambda store: deleted.append(store.bulk_delete(store.completed_ids()))):
+        store = st.session_state.store
+        st.session_state.selected_tasks = {task_id for task_id in st.session_state.selected_tasks
+                                           if task_id in store}
+        st.toast(f"Cleared {deleted[0]} completed tasks 🧹")
+
+# Act on many tasks at once: the selection, or everything matching the current filters
+def display_bulk_actions(query, total_matches):
+    store = st.session_state.store
+    with st.expander("☑️ Bulk actions"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button(f"Select all {total_matches} matching tasks", on_click=select_matching, args=(query,))
+        with col2:
+            st.button("Clear selection", on_click=clear_selection)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.button("✅ Complete selected", on_click=bulk_update_selected,
+                      args=("Completed {count} tasks ✅",), kwargs={"completed": True})
+        with col2:
+            st.button("↩️ Reopen selected", on_click=bulk_update_selected,
+                      args=("Reopened {count} tasks ↩️",), kwargs={"completed": False})
+        with col3:
+            st.button("🗑️ Delete selected", on_click=bulk_delete_selected)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            category = st.selectbox("Move selected to category", CATEGORIES, key="bulk_category")
+            st.button("Move 📂", on_click=bulk_update_selected,
+                      args=("Moved {count} tasks to " + category,), kwargs={"category": category})
+        with col2:
+            priority = st.selectbox("Set priority of selected", PRIORITIES, key="bulk_priority")
+            st.button("Set priority 🎚️", on_click=bulk_update_selected,
+                      args=("Set {count} tasks to " + priority,), kwargs={"priority": priority})
+        
+        completed = store.get_stats().completed
+        if completed:
+            st.button(f"🧹 Delete all {completed} completed tasks", on_click=delete_completed)
+
+def start_editing(task_id):
+    st.session_state.editing_todo = task_id
+
+# A single task row; interacting with it reruns only this fragment
+@st.fragment
+def display_todo_row(task_id):
+    store = st.session_state.store
+    todo = store.get(task_id)
+    if todo is None:
+        # Deleted from this row; render nothing until the next full rerun drops it
+        return
+    
+    with st.container():
+        select_col, col1, col2, col3, col4 = st.columns([0.3, 0.5, 3, 1, 1])
+        
+        with select_col:
+            st.session_state[f"select_{todo['id']}"] = todo['id'] in st.session_state.selected_tasks
+            st.checkbox("Select", key=f"select_{todo['id']}", label_visibility="collapsed",
+                        help="Select for bulk actions", on_change=toggle_selected, args=(todo['id'],))
+        
+        with col1:
+            st.markdown(f"<div class='cat-decoration'>{todo['cat_emoji']}</div>", unsafe_allow_html=True)
+        
+        with col2:
+            # Always show the stored state, even if another tab changed it
+            st.session_state[f"todo_{todo['id']}"] = todo["completed"]
+            st.checkbox("", key=f"todo_{todo['id']}",
+                        on_change=toggle_todo, args=(todo['id'], todo.rev))
             
-            with col3:
-                if st.button("🗑️", key=f"delete_{todo['id']}", help="Delete task"):
-                    st.session_state.todos = [t for t in st.session_state.todos if t['id'] != todo['id']]
-                    st.rerun()
+            if st.session_state.get('celebrate_todo') == todo['id']:
+                st.session_state.celebrate_todo = None
+                play_meow_sound()
+                st.balloons()
             
-            with col4:
-                if st.button("📝", key=f"edit_{todo['id']}", help="Edit task"):
-                    st.session_state.editing_todo = todo['id']
+            task_style = "completed-item" if todo["completed"] else "todo-item"
+            st.markdown(f"""
+            <div class="{task_style}">
+                <h4>{todo['task']}</h4>
+                <p><strong>Priority:</strong> {todo['priority']} | <strong>Category:</strong> {todo['category']}</p>
+                <small>Created: {todo['created_at']}</small>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col3:
+            st.button("🗑️", key=f"delete_{todo['id']}", help="Delete task",
+                      on_click=delete_todo, args=(todo['id'], todo.rev))
+        
+        with col4:
+            st.button("📝", key=f"edit_{todo['id']}", help="Edit task",
+                      on_click=start_editing, args=(todo['id'],))
+        
+        if st.session_state.get('editing_todo') == todo['id']:
+            edit_todo(todo)
+
+# Previous / next page buttons for the task list
+def display_page_navigation(shown, next_cursor, total_matches, page_size):
+    cursors = st.session_state.page_cursors
+    first = (len(cursors) - 1) * page_size + 1
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    
+    with col1:
+        if len(cursors) > 1 and st.button("⬅️ Previous", key="page_prev"):
+            cursors.pop()
+            st.rerun()
+    
+    with col2:
+        if shown:
+            st.markdown(f"<p style='text-align: center;'>Showing {first}–{first + shown - 1} "
+                        f"of {total_matches} tasks</p>", unsafe_allow_html=True)
+    
+    with col3:
+        if next_cursor is not None and st.button("Next ➡️", key="page_next"):
+            cursors.append(next_cursor)
+            st.rerun()
+
+# Save an edit from the form's widget values
+def save_todo_edit(task_id, rev):
+    new_task = st.session_state[f"edit_task_{task_id}"]
+    if new_task:
+        write_to_store(lambda store: store.update(
+            task_id,
+            expected_rev=rev,
+            task=new_task,
+            priority=st.session_state[f"edit_priority_{task_id}"],
+            category=st.session_state[f"edit_category_{task_id}"]
+        ))
+        st.session_state.editing_todo = None
+
+def cancel_todo_edit():
+    st.session_state.editing_todo = None
 
-# Statistics
+# Edit an existing todo in place
+def edit_todo(todo):
+    with st.form(f"edit_todo_form_{todo['id']}"):
+        st.text_input("Task", value=todo["task"], key=f"edit_task_{todo['id']}")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.selectbox("Priority", PRIORITIES, key=f"edit_priority_{todo['id']}",
+                         index=PRIORITIES.index(todo["priority"]) if todo["priority"] in PRIORITIES else 0)
+        
+        with col2:
+            st.selectbox("Category", CATEGORIES, key=f"edit_category_{todo['id']}",
+                         index=CATEGORIES.index(todo["category"]) if todo["category"] in CATEGORIES else 0)
+        
+        save_col, cancel_col = st.columns(2)
+        with save_col:
+            st.form_submit_button("Save 💾", on_click=save_todo_edit, args=(todo['id'], todo.rev))
+        with cancel_col:
+            st.form_submit_button("Cancel", on_click=cancel_todo_edit)
+
+# Statistics; the one fragment on a timer, so edits from row fragments and other sessions
+# show up here without rerunning the whole page. Task rows catch up on the next interaction.
+@st.fragment(run_every=SYNC_SECONDS or None)
 def display_stats():
-    if st.session_state.todos:
-        total_tasks = len(st.session_state.todos)
-        completed_tasks = len([todo for todo in st.session_state.todos if todo["completed"]])
-        completion_rate = (completed_tasks / total_tasks) * 100 if total_tasks > 0 else 0
+    store = st.session_state.store
+    store.refresh()
+    stats = store.get_stats()
+    if stats.total:
+        total_tasks = stats.total
+        completed_tasks = stats.completed
+        completion_rate = stats.completion_rate
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -281,6 +503,26 @@ def display_stats():
                 <div class="cat-decoration">😸🎊😸</div>
             </div>
             """, unsafe_allow_html=True)
+        
+        # Charts live in the fragment too, so row edits show up here without a full rerun
+        st.markdown("### 📈 Category Breakdown")
+        st.bar_chart(dict(stats.by_category))
+        
+        if stats.completions_by_day:
+            st.markdown("### 🗓️ Completed Over Time")
+            st.bar_chart(dict(sorted(stats.completions_by_day.items())))
+
+# The bytes of an up-to-date export. Another session's newer export removes older files,
+# so if ours disappears before it is read, export again.
+def read_export(store, export_format, attempts=3):
+    for attempt in range(attempts):
+        path = export_file(store, export_format, EXPORT_DIR)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
 
 # Sidebar options
 def display_sidebar():
@@ -289,35 +531,87 @@ def display_sidebar():
     # Sound toggle
     st.session_state.cat_sounds = st.sidebar.checkbox("Enable meow sounds 🔊", value=st.session_state.cat_sounds)
     
-    # Clear all tasks
+    # Clear all tasks, but only if nobody changed the list between asking and confirming
+    store = st.session_state.store
     if st.sidebar.button("🗑️ Clear All Tasks"):
+        st.session_state.confirm_clear_version = store.version
+    
+    if st.session_state.get('confirm_clear_version') is not None:
         if st.sidebar.button("⚠️ Confirm Clear All"):
-            st.session_state.todos = []
-            st.sidebar.success("All tasks cleared! 🐱")
-            st.rerun()
+            try:
+                store.clear(expected_version=st.session_state.confirm_clear_version)
+                st.session_state.confirm_clear_version = None
+                st.sidebar.success("All tasks cleared! 🐱")
+                st.rerun()
+            except ConflictError:
+                st.session_state.confirm_clear_version = store.version
+                st.sidebar.warning("The list changed in another tab. Confirm again to clear it all.")
     
     # Export/Import
     st.sidebar.markdown("### 📁 Data Management")
     
-    if st.sidebar.button("📥 Export Tasks"):
-        if st.session_state.todos:
-            json_data = json.dumps(st.session_state.todos, indent=2)
-            st.sidebar.download_button(
-                label="💾 Download JSON",
-                data=json_data,
-                file_name=f"cat_todos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json"
-            )
+    if len(st.session_state.store):
+        export_format = st.sidebar.selectbox("📥 Export format", list(EXPORT_FORMATS))
+        extension, mime = EXPORT_FORMATS[export_format]
+        store = st.session_state.store
+        # The export is only built when the button is clicked, and reused until the tasks change
+        st.sidebar.download_button(
+            label="💾 Download Tasks",
+            data=lambda: read_export(store, export_format),
+            file_name=f"cat_todos_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}",
+            mime=mime
+        )
     
-    uploaded_file = st.sidebar.file_uploader("📤 Import Tasks", type="json")
-    if uploaded_file is not None:
+    uploaded_file = st.sidebar.file_uploader("📤 Import Tasks", type=["json", "ndjson", "jsonl"])
+    # The uploader keeps its file across reruns, so only try each upload once, even if it fails
+    if uploaded_file is not None and st.session_state.get('imported_file_id') != uploaded_file.file_id:
+        st.session_state.imported_file_id = uploaded_file.file_id
+        st.session_state.import_report = None
+        st.session_state.import_error = None
+        progress = st.sidebar.progress(0.0, text="Importing tasks...")
+        total_bytes = max(uploaded_file.size, 1)
+        
+        def show_progress(report):
+            done = min(uploaded_file.tell() / total_bytes, 1.0)
+            progress.progress(done, text=f"Imported {report['added']} tasks...")
+        
         try:
-            imported_todos = json.load(uploaded_file)
-            st.session_state.todos.extend(imported_todos)
-            st.sidebar.success("Tasks imported successfully! 🐱")
+            st.session_state.import_report = import_tasks(
+                st.session_state.store,
+                uploaded_file,
+                default_emoji=get_random_cat_image,
+                on_progress=show_progress
+            )
+        except (ValueError, sqlite3.Error) as e:
+            progress.empty()
+            st.session_state.import_error = str(e)
+        else:
             st.rerun()
-        except Exception as e:
-            st.sidebar.error(f"Error importing tasks: {e}")
+    
+    report = st.session_state.get('import_report')
+    if st.session_state.get('import_error'):
+        st.sidebar.error(f"Error importing tasks: {st.session_state.import_error}")
+    elif report:
+        st.sidebar.success(
+            f"Imported {report['added']} tasks! 🐱 "
+            f"({report['duplicates']} duplicates and {report['invalid']} invalid skipped)"
+        )
+
+# Cat gallery; button clicks only rerun this fragment
+@st.fragment
+def display_cat_gallery():
+    st.markdown("### 🎨 Cat Gallery")
+    st.markdown("Here are some cute cats to motivate you! 🐱")
+    
+    # Display a grid of cat emojis
+    cat_cols = st.columns(6)
+    cats = ["🐱", "😸", "😹", "😻", "😼", "😽", "🙀", "😿", "😾", "🐈", "🐈‍⬛", "🦁"]
+    
+    for i, cat in enumerate(cats):
+        with cat_cols[i % 6]:
+            if st.button(cat, key=f"cat_{i}"):
+                play_meow_sound()
+                st.toast(f"Meow! {cat}")
 
 # Main app
 def main():
@@ -340,30 +634,9 @@ def main():
     with tab2:
         st.markdown("### 📊 Task Statistics")
         display_stats()
-        
-        # Additional charts could go here
-        if st.session_state.todos:
-            st.markdown("### 📈 Category Breakdown")
-            categories = {}
-            for todo in st.session_state.todos:
-                cat = todo["category"]
-                categories[cat] = categories.get(cat, 0) + 1
-            
-            st.bar_chart(categories)
     
     with tab3:
-        st.markdown("### 🎨 Cat Gallery")
-        st.markdown("Here are some cute cats to motivate you! 🐱")
-        
-        # Display a grid of cat emojis
-        cat_cols = st.columns(6)
-        cats = ["🐱", "😸", "😹", "😻", "😼", "😽", "🙀", "😿", "😾", "🐈", "🐈‍⬛", "🦁"]
-        
-        for i, cat in enumerate(cats):
-            with cat_cols[i % 6]:
-                if st.button(cat, key=f"cat_{i}"):
-                    play_meow_sound()
-                    st.toast(f"Meow! {cat}")
+        display_cat_gallery()
 
 if __name__ == "__main__":
     main()
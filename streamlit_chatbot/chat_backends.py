@@ -0,0 +1,122 @@
+import hashlib
+import os
+import random
+
+DEFAULT_BACKEND = os.environ.get("CHAT_BACKEND")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-flash")
+FAKE_LATENCY = float(os.environ.get("CHAT_FAKE_LATENCY", "0.3"))
+FAKE_TOKENS_PER_SECOND = float(os.environ.get("CHAT_FAKE_TOKENS_PER_SECOND", "30"))
+
+
+class ChatBackend:
+    """Produces an assistant reply as a stream of text chunks
+
+    `messages` is the chat history as {"role", "content"} dicts, ending
+    with the user's latest prompt. Implementations should stop early once
+    `cancel` is set. `model_name` identifies the model behind it, e.g.
+    for keeping cached replies apart.
+    """
+
+    name = "base"
+    model_name = ""
+
+    def stream(self, messages, cancel):
+        raise NotImplementedError
+
+
+class FakeBackend(ChatBackend):
+    """Local stand-in model: replies "You said: ..." at a configurable pace
+
+    Waits `first_token_latency` seconds, then emits word-sized tokens at
+    `tokens_per_second`, with optional jitter drawn from a generator
+    seeded by the prompt, so the same prompt always streams the same way.
+    """
+
+    name = "fake"
+    model_name = "echo"
+
+    def __init__(self, first_token_latency=FAKE_LATENCY, tokens_per_second=FAKE_TOKENS_PER_SECOND,
+                 jitter=0.0):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+
+    def reply(self, messages):
+        return f"You said: {messages[-1]['content']}"
+
+    def tokens(self, text):
+        words = text.split(" ")
+        return [words[0]] + [" " + word for word in words[1:]]
+
+    def stream(self, messages, cancel):
+        prompt = messages[-1]["content"]
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        if cancel.wait(self.first_token_latency):
+            return
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for i, token in enumerate(self.tokens(self.reply(messages))):
+            if i and interval:
+                delay = interval * (1 + self.jitter * (2 * rng.random() - 1))
+                if cancel.wait(max(0.0, delay)):
+                    return
+            yield token
+
+
+class GeminiBackend(ChatBackend):
+    """Google Gemini via google-generativeai; needs GOOGLE_API_KEY
+
+    System messages (the system prompt and any summary) are passed as the
+    model's system instruction; only user and model turns are sent as
+    contents.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model=GEMINI_MODEL, api_key=None):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key or os.environ["GOOGLE_API_KEY"])
+        self.genai = genai
+        self.model_name = model
+        self.model = genai.GenerativeModel(model)
+
+    def stream(self, messages, cancel):
+        system = "\n\n".join(message["content"] for message in messages if message["role"] == "system")
+        contents = [
+            {"role": "model" if message["role"] == "assistant" else "user", "parts": [message["content"]]}
+            for message in messages
+            if message["role"] != "system"
+        ]
+        # The instruction changes with the summary, so it gets its own (cheap, local) model object
+        model = self.genai.GenerativeModel(self.model_name, system_instruction=system) if system else self.model
+        response = model.generate_content(contents, stream=True)
+        for chunk in response:
+            if cancel.is_set():
+                return
+            if chunk.text:
+                yield chunk.text
+
+
+BACKENDS = {
+    "fake": FakeBackend,
+    "gemini": GeminiBackend,
+}
+
+
+def gemini_available():
+    if not os.environ.get("GOOGLE_API_KEY"):
+        return False
+    try:
+        import google.generativeai  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_backend(name=DEFAULT_BACKEND, **options):
+    """Backend by name; by default Gemini when it is configured, else the fake model"""
+    if name is None:
+        name = "gemini" if gemini_available() else "fake"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown chat backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
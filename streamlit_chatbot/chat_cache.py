@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 1024
+TTL_SECONDS = float(os.environ.get("CHAT_CACHE_TTL", "3600"))
+CACHE_DB = os.environ.get("CHAT_CACHE_DB")
+
+DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses(expires_at);
+"""
+
+
+def normalize_prompt(prompt):
+    """Case-fold, collapse whitespace and drop trailing punctuation: "Hi!! " == "hi" """
+    text = re.sub(r"\s+", " ", prompt.casefold()).strip()
+    return re.sub(r"[\s.!?…]+$", "", text)
+
+
+def cache_key(messages, namespace=""):
+    """Key for a reply to exactly this context: every message sent to the model
+
+    The system prompt, any summary and all earlier turns are part of the
+    key, so one conversation never gets a reply written for another; only
+    the latest prompt is normalized. `namespace` should name the backend
+    and model, so changing either misses the cache.
+    """
+    context = [(m["role"], m["content"]) for m in messages[:-1]]
+    payload = json.dumps([namespace, context, normalize_prompt(messages[-1]["content"])], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of model replies, with an optional SQLite tier
+
+    The in-memory tier holds up to `max_entries` replies in recency
+    order. With `disk_path`, replies are also written to SQLite, which
+    outlives the process and is shared by every process using the file;
+    memory misses fall through to it and promote what they find.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, disk_path=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._conn = None
+        self._disk_writes = 0
+        if disk_path:
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False, timeout=30, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(DISK_SCHEMA)
+            self._disk_lock = threading.Lock()
+
+    def _remember(self, key, expires_at, response):
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        if self._conn is not None:
+            with self._disk_lock:
+                row = self._conn.execute(
+                    "SELECT response, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            if row is not None:
+                with self._lock:
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, response):
+        expires_at = self.clock() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, response)
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, response, expires_at),
+                )
+                # Drop expired rows now and then rather than on every read
+                self._disk_writes += 1
+                if self._disk_writes % 100 == 0:
+                    self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (self.clock(),))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute("DELETE FROM responses")
+
+
+class CachedBackend:
+    """A backend paired with the ResponseCache of its replies
+
+    Callers look a reply up with cached_reply() before asking the model,
+    and store() it only once it has streamed to the end, never when it
+    was cancelled or failed part way.
+    """
+
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache or ResponseCache()
+
+    def key(self, messages):
+        return cache_key(messages, namespace=f"{self.backend.name}:{self.backend.model_name}")
+
+    def cached_reply(self, messages):
+        """The cached reply for these messages, or None (counted as a hit or miss)"""
+        return self.cache.get(self.key(messages))
+
+    def store(self, messages, response):
+        self.cache.put(self.key(messages), response)
@@ -0,0 +1,115 @@
+import os
+import re
+from array import array
+
+from chat_history import summarize_turn
+
+CONTEXT_TOKENS = int(os.environ.get("CHAT_CONTEXT_TOKENS", "3000"))
+SYSTEM_PROMPT = os.environ.get("CHAT_SYSTEM_PROMPT", "You are a friendly, helpful assistant. Keep answers concise.")
+MESSAGE_OVERHEAD = 4  # role and separators
+SUMMARY_SHARE = 0.25  # of the budget, at most
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """Rough token count: about one per 4 characters of a word, one per punctuation mark
+
+    Close enough to BPE tokenizers for budgeting without depending on one.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _PIECES.findall(text))
+
+
+class ContextBuilder:
+    """Picks what of a ChatHistory to send to the model within a token budget
+
+    The system prompt is always sent first. After it come a running
+    summary of the older messages, kept to about a quarter of the budget,
+    and as many of the newest messages as fit in `budget`. Token counts
+    are cached per message and the first kept message only ever moves
+    forward, so each build only counts the messages added since the last
+    one and summarizes those that fell out of the window since then. A
+    history that already spilled messages to disk with its own summary is
+    picked up from that summary rather than re-read.
+    """
+
+    def __init__(self, history, budget=CONTEXT_TOKENS, system_prompt=SYSTEM_PROMPT,
+                 counter=count_tokens, summarizer=summarize_turn):
+        self.history = history
+        self.budget = budget
+        self.system_prompt = system_prompt
+        self.counter = counter
+        self.summarizer = summarizer
+        self.system_tokens = self._cost(system_prompt) if system_prompt else 0
+        self.summary_chars = int(budget * SUMMARY_SHARE) * 4
+        self.reset()
+
+    def reset(self):
+        self.counts = array("i")  # tokens per message, by conversation position
+        self.start = 0  # first message sent verbatim
+        self.kept_tokens = 0  # tokens in messages start..end
+        self.summary = ""
+        self.summary_tokens = 0
+
+    def _cost(self, text):
+        return self.counter(text) + MESSAGE_OVERHEAD
+
+    def _start_from_history_summary(self):
+        """Begin after the history's spilled messages, using its summary of them"""
+        summary = self.history.summary
+        if len(summary) > self.summary_chars:
+            cut = summary.find("\n", len(summary) - self.summary_chars)
+            summary = summary[cut + 1:] if cut != -1 else summary[-self.summary_chars:]
+        self.summary = summary
+        self.summary_tokens = self._cost(SUMMARY_HEADER + summary)
+        self.counts = array("i", bytes(self.counts.itemsize * self.history.spilled))
+        self.start = self.history.spilled
+
+    def _count_new(self):
+        end = len(self.history)
+        if end < len(self.counts):  # The history was cleared
+            self.reset()
+        if not self.counts and self.history.spilled and self.history.summarizer:
+            self._start_from_history_summary()
+        added = self.history.slice(len(self.counts), end)
+        for message in added:
+            tokens = self._cost(message["content"])
+            self.counts.append(tokens)
+            self.kept_tokens += tokens
+
+    def _drop_oldest(self):
+        """Fold messages into the summary until the kept ones fit, always keeping the newest"""
+        available = self.budget - self.system_tokens - self.summary_tokens
+        last = len(self.counts) - 1
+        stop = self.start
+        tokens = self.kept_tokens
+        while stop < last and tokens > available:
+            tokens -= self.counts[stop]
+            stop += 1
+        if stop == self.start:
+            return False
+        for message in self.history.slice(self.start, stop):
+            self.summary = self.summarizer(self.summary, message, self.summary_chars)
+        self.summary_tokens = self._cost(SUMMARY_HEADER + self.summary)
+        self.kept_tokens = tokens
+        self.start = stop
+        return True
+
+    def build(self):
+        """The messages to send: system prompt, summary of dropped turns, then the newest turns"""
+        self._count_new()
+        # A longer summary can push out another message or two
+        while self._drop_oldest():
+            pass
+        messages = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        if self.summary:
+            messages.append({"role": "system", "content": SUMMARY_HEADER + self.summary})
+        messages.extend(self.history.slice(self.start))
+        return messages
+
+    def tokens(self):
+        """Estimated tokens in the last build()"""
+        return self.system_tokens + self.summary_tokens + self.kept_tokens
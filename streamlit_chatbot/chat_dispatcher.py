@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+WORKERS = int(os.environ.get("CHAT_WORKERS", "4"))
+RATE_LIMIT = float(os.environ.get("CHAT_RATE_LIMIT", "0"))  # model calls per second, 0 = unlimited
+RATE_BURST = int(os.environ.get("CHAT_RATE_BURST", "5"))
+MAX_QUEUED = int(os.environ.get("CHAT_MAX_QUEUED", "1000"))
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+def job_key(messages):
+    """Exact identity of a request: the whole message list, byte for byte"""
+    payload = json.dumps([(m["role"], m["content"]) for m in messages], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, up to `burst` at once"""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel=None):
+        """Wait for a token; False if `cancel` was set first"""
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if cancel is None:
+                time.sleep(wait)
+            elif cancel.wait(wait):
+                return False
+
+
+class Job:
+    """One model call, shared by every ticket waiting on the same messages"""
+
+    def __init__(self, key, session_id, messages):
+        self.key = key
+        self.session_id = session_id
+        self.messages = list(messages)
+        self.chunks = []
+        self.error = None
+        self.started = False
+        self.done = False
+        self.subscribers = 0
+        self.cancel = threading.Event()
+        self.changed = threading.Condition()
+
+    def publish(self, chunk=None, error=None, done=False):
+        with self.changed:
+            if chunk is not None:
+                self.chunks.append(chunk)
+            if error is not None:
+                self.error = error
+            self.done = self.done or done
+            self.changed.notify_all()
+
+
+class Ticket:
+    """A session's handle on a queued or running reply"""
+
+    def __init__(self, dispatcher, job):
+        self.dispatcher = dispatcher
+        self.job = job
+        self.cancelled = False
+
+    def position(self):
+        """Requests that will be sent to the model before this one, or None once it has started"""
+        return self.dispatcher.position(self.job)
+
+    def wait_started(self, timeout=None):
+        with self.job.changed:
+            return self.job.changed.wait_for(lambda: self.job.started or self.job.done or self.cancelled,
+                                             timeout)
+
+    def stream(self):
+        """Yield the reply's chunks as they arrive, from the start even if joined late"""
+        job = self.job
+        sent = 0
+        try:
+            while True:
+                with job.changed:
+                    job.changed.wait_for(lambda: sent < len(job.chunks) or job.done or self.cancelled)
+                    if self.cancelled:
+                        return
+                    chunks = job.chunks[sent:]
+                    finished = job.done
+                for chunk in chunks:
+                    yield chunk
+                sent += len(chunks)
+                if finished and sent == len(job.chunks):
+                    if job.error is not None:
+                        raise job.error
+                    return
+        finally:
+            if not (job.done and sent == len(job.chunks)):
+                self.cancel()
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self.dispatcher.release(self.job)
+            with self.job.changed:
+                self.job.changed.notify_all()
+
+
+class Dispatcher:
+    """Process-wide gate between chat sessions and one shared backend client
+
+    At most `workers` model calls run at once, started no faster than
+    `rate` per second when a rate is set. Waiting requests are queued per
+    session and served round-robin, so one busy session cannot starve the
+    others. A request whose messages are exactly those of one already
+    queued or running (the whole context, not just the prompt) joins that
+    call instead of making another; the call is only cancelled once every
+    ticket on it has given up.
+    """
+
+    def __init__(self, backend, workers=WORKERS, rate=RATE_LIMIT, burst=RATE_BURST, max_queued=MAX_QUEUED):
+        self.backend = backend
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_queued = max_queued
+        self._queues = OrderedDict()  # session_id -> deque of waiting jobs, in round-robin order
+        self._queued = 0
+        self._inflight = {}  # key -> job, queued or running
+        self._lock = threading.Condition()
+        self._closed = False
+        self.running = 0
+        self.calls = 0
+        self.coalesced = 0
+        self._threads = [
+            threading.Thread(target=self._work, name=f"chat-dispatch-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, session_id, messages):
+        key = job_key(messages)
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None and not job.cancel.is_set():
+                self.coalesced += 1
+            else:
+                if self._queued >= self.max_queued:
+                    raise QueueFull(f"{self._queued} requests are already waiting for the model")
+                job = Job(key, session_id, messages)
+                self._inflight[key] = job
+                self._queues.setdefault(session_id, deque()).append(job)
+                self._queued += 1
+                self._lock.notify()
+            job.subscribers += 1
+        return Ticket(self, job)
+
+    def release(self, job):
+        """Drop one ticket's interest in `job`, cancelling it when nobody is left"""
+        with self._lock:
+            job.subscribers -= 1
+            if job.subscribers > 0 or job.done:
+                return
+            job.cancel.set()
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            queue = self._queues.get(job.session_id)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[job.session_id]
+
+    def position(self, job):
+        with self._lock:
+            if job.started or job.done:
+                return None
+            sessions = list(self._queues.values())
+            for turn, queue in enumerate(sessions):
+                if job in queue:
+                    depth = queue.index(job)
+                    break
+            else:
+                return None
+            # Round-robin: sessions before ours get one more turn than those after it
+            ahead = depth
+            for i, queue in enumerate(sessions):
+                if i != turn:
+                    ahead += min(len(queue), depth + 1 if i < turn else depth)
+            return ahead
+
+    def _next_job(self):
+        with self._lock:
+            while not self._queues and not self._closed:
+                self._lock.wait()
+            if self._closed:
+                return None
+            session_id, queue = self._queues.popitem(last=False)
+            job = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues[session_id] = queue  # Back of the line
+            job.started = True
+            self.running += 1
+            self.calls += 1
+        job.publish()
+        return job
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                if self.bucket is None or self.bucket.acquire(job.cancel):
+                    for chunk in self.backend.stream(job.messages, job.cancel):
+                        if job.cancel.is_set():
+                            break
+                        job.publish(chunk)
+            except Exception as e:  # Handed to every ticket, which re-raise it
+                job.publish(error=e)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    if self._inflight.get(job.key) is job:
+                        del self._inflight[job.key]
+                job.publish(done=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queued,
+                "running": self.running,
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,98 @@
+import json
+import os
+import weakref
+from array import array
+from collections import deque
+
+WINDOW = 200
+SUMMARY_CHARS = 2000
+SUMMARY_LINE_CHARS = 120
+
+
+def summarize_turn(summary, message, limit=SUMMARY_CHARS):
+    """Fold one evicted message into a running summary of short "role: text" lines
+
+    A cheap extractive stand-in for a model-written summary: each turn
+    keeps its first line, clipped, and only the newest `limit` characters
+    of the summary are kept.
+    """
+    text = message["content"].strip().splitlines()[0] if message["content"].strip() else ""
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 1] + "…"
+    summary = f"{summary}\n{message['role']}: {text}" if summary else f"{message['role']}: {text}"
+    if len(summary) > limit:
+        cut = summary.find("\n", len(summary) - limit)
+        summary = summary[cut + 1:] if cut != -1 else summary[-limit:]
+    return summary
+
+
+def _remove_log(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ChatHistory:
+    """Chat messages with only a recent window in memory
+
+    The newest `window` messages live in a ring buffer; older ones are
+    appended to an NDJSON log on disk as they are evicted, with their
+    byte offsets kept so any range can be read back without scanning the
+    file. Messages are addressed by their position in the whole
+    conversation. If a `summarizer` is given, each evicted message is also
+    folded into `summary`. The log is deleted once the history is garbage
+    collected or the process exits, so it lasts only as long as the session.
+    """
+
+    def __init__(self, log_path, window=WINDOW, summarizer=None):
+        self.log_path = log_path
+        self.recent = deque(maxlen=window)
+        self.spilled = 0
+        self.offsets = array("q")  # byte offset of each spilled message in the log
+        self.summarizer = summarizer
+        self.summary = ""
+        _remove_log(log_path)  # A new history starts a new log
+        self._finalizer = weakref.finalize(self, _remove_log, log_path)
+
+    def __len__(self):
+        return self.spilled + len(self.recent)
+
+    def append(self, message):
+        if len(self.recent) == self.recent.maxlen:
+            self._spill(self.recent[0])
+        self.recent.append(message)
+
+    def _spill(self, message):
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with open(self.log_path, "ab") as f:
+            self.offsets.append(f.tell())
+            f.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.spilled += 1
+        if self.summarizer:
+            self.summary = self.summarizer(self.summary, message)
+
+    def _read_spilled(self, start, stop):
+        if start >= stop:
+            return []
+        with open(self.log_path, "rb") as f:
+            f.seek(self.offsets[start])
+            return [json.loads(f.readline()) for _ in range(stop - start)]
+
+    def slice(self, start, stop=None):
+        """Messages start..stop (conversation positions), from disk and memory as needed"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        start = max(0, start)
+        older = self._read_spilled(start, min(stop, self.spilled))
+        newer = [self.recent[i - self.spilled] for i in range(max(start, self.spilled), stop)]
+        return older + newer
+
+    def tail(self, count):
+        return self.slice(len(self) - count)
+
+    def clear(self):
+        self.recent.clear()
+        self.offsets = array("q")
+        self.spilled = 0
+        self.summary = ""
+        _remove_log(self.log_path)
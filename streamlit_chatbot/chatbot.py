@@ -1,36 +1,142 @@
 import streamlit as st
+import os
+import uuid
+
+from chat_backends import get_backend
+from chat_cache import CACHE_DB, CachedBackend, ResponseCache
+from chat_context import ContextBuilder
+from chat_dispatcher import Dispatcher, QueueFull
+from chat_history import ChatHistory, summarize_turn
 ## Creating a Simple Streamlit Chatbot
 
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CHAT_LOG_DIR = os.environ.get("CHAT_LOG_DIR", os.path.join(APP_DIR, "chat_logs"))
+SHOW_MESSAGES = 50
+
+@st.cache_resource
+def load_backend():
+    """The chat backend behind a reply cache shared by every session"""
+    return CachedBackend(get_backend(), ResponseCache(disk_path=CACHE_DB))
+
+@st.cache_resource
+def load_dispatcher():
+    """One queue and worker pool in front of the backend for every session"""
+    return Dispatcher(load_backend().backend)
+
 def initialize_session_state():
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    if "history" not in st.session_state:
+        log_path = os.path.join(CHAT_LOG_DIR, f"{st.session_state.session_id}.ndjson")
+        st.session_state.history = ChatHistory(log_path, summarizer=summarize_turn)
+    if "context" not in st.session_state:
+        st.session_state.context = ContextBuilder(st.session_state.history)
+    if "shown_messages" not in st.session_state:
+        st.session_state.shown_messages = SHOW_MESSAGES
+    if "cancel_reply" not in st.session_state:
+        st.session_state.cancel_reply = None
+    if "partial_reply" not in st.session_state:
+        st.session_state.partial_reply = None
+
+def stop_previous_reply():
+    """Cancel a reply interrupted by a new message and keep what it had said"""
+    if st.session_state.cancel_reply is not None:
+        st.session_state.cancel_reply.cancel()
+        st.session_state.cancel_reply = None
+    if st.session_state.partial_reply is not None:
+        partial = "".join(st.session_state.partial_reply)
+        if partial:
+            st.session_state.history.append({"role": "assistant", "content": partial + " …"})
+        st.session_state.partial_reply = None
+
+def collect(chunks, collected):
+    """Pass chunks through, remembering them in case the run is interrupted"""
+    for chunk in chunks:
+        collected.append(chunk)
+        yield chunk
+
+def wait_for_turn(ticket):
+    """Show the reply's place in the queue until the model starts on it"""
+    status = st.empty()
+    while not ticket.wait_started(timeout=0.25):
+        ahead = ticket.position()
+        if ahead:
+            status.caption(f"⏳ The bot is busy: {ahead} replies ahead of yours")
+    status.empty()
+
+def show_earlier_messages():
+    st.session_state.shown_messages += SHOW_MESSAGES
+
+def display_cache_stats(backend):
+    stats = backend.cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    st.sidebar.caption(
+        f"Reply cache: {stats['hits']} hits / {lookups} lookups ({stats['hit_rate']:.0%}), "
+        f"{stats['entries']} cached"
+    )
+
+def display_history(history):
+    """Render only the newest messages, with a button to page back through older ones"""
+    hidden = len(history) - st.session_state.shown_messages
+    if hidden > 0:
+        st.button(f"⬆️ Load earlier messages ({hidden} hidden)", on_click=show_earlier_messages)
+        if history.summary:
+            with st.expander("Summary of earlier conversation"):
+                st.text(history.summary)
+    for message in history.tail(st.session_state.shown_messages):
+        with st.chat_message(message["role"]):
+            st.write(message["content"])
 
 def main():
     st.title("Simple Chatbot")
-    
+
     initialize_session_state()
+    stop_previous_reply()
+    history = st.session_state.history
 
     # Display chat messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.write(message["content"])
+    display_history(history)
 
     # Chat input
     if prompt := st.chat_input("What's on your mind?"):
         # Display user message
         with st.chat_message("user"):
             st.write(prompt)
-        
+
         # Add user message to history
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        
-        # Add simple bot response
-        response = f"You said: {prompt}"
-        with st.chat_message("assistant"):
-            st.write(response)
-        
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        history.append({"role": "user", "content": prompt})
+
+        backend = load_backend()
+        messages = st.session_state.context.build()
+        response = backend.cached_reply(messages)
+        if response is not None:
+            # Answered this before: show it at once, no worker thread needed
+            with st.chat_message("assistant"):
+                st.write(response)
+        else:
+            # Queue the request with the shared dispatcher and stream the reply as it arrives
+            st.session_state.partial_reply = []
+            with st.chat_message("assistant"):
+                try:
+                    ticket = load_dispatcher().submit(st.session_state.session_id, messages)
+                    st.session_state.cancel_reply = ticket
+                    wait_for_turn(ticket)
+                    response = st.write_stream(collect(ticket.stream(), st.session_state.partial_reply))
+                    if response:
+                        backend.store(messages, response)  # Only replies that streamed to the end
+                except QueueFull:
+                    response = None
+                    st.warning("The bot has too many people waiting right now, please try again in a moment.")
+                except Exception as e:
+                    response = "".join(st.session_state.partial_reply)
+                    st.error(f"Sorry, the model couldn't answer: {e}")
+
+            st.session_state.cancel_reply = None
+            st.session_state.partial_reply = None
+        if response:
+            history.append({"role": "assistant", "content": response})
+
+    display_cache_stats(load_backend())
 
 if __name__ == "__main__":
     main()
-
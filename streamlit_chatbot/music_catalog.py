@@ -0,0 +1,343 @@
+import csv
+from array import array
+import os
+import pickle
+import random
+import sys
+import threading
+
+import numpy as np
+
+from music_neighbors import build_index
+from quiz_engine import PERSONALITIES
+
+# Built-in catalog, used when no MUSIC_CATALOG file is configured
+# Music database organized by personality types
+MUSIC_DATABASE = {
+    "adventurous": {
+        "genres": ["Electronic", "World Music", "Experimental", "Jazz Fusion"],
+        "songs": [
+            "Strobe - Deadmau5",
+            "Bambaataa - Shpongle",
+            "Teardrop - Massive Attack",
+            "Windowlicker - Aphex Twin",
+            "Kiara - Bonobo"
+        ]
+    },
+    "chill": {
+        "genres": ["Lo-fi", "Ambient", "Indie Folk", "Neo-Soul"],
+        "songs": [
+            "Girl - Syml",
+            "Holocene - Bon Iver",
+            "Breathe Me - Sia",
+            "Mad World - Gary Jules",
+            "Skinny Love - Bon Iver"
+        ]
+    },
+    "energetic": {
+        "genres": ["Pop", "Dance", "Rock", "Hip-Hop"],
+        "songs": [
+            "Uptown Funk - Bruno Mars",
+            "Can't Stop the Feeling - Justin Timberlake",
+            "Good as Hell - Lizzo",
+            "Shut Up and Dance - Walk the Moon",
+            "Happy - Pharrell Williams"
+        ]
+    },
+    "romantic": {
+        "genres": ["R&B", "Soft Rock", "Acoustic", "Soul"],
+        "songs": [
+            "All of Me - John Legend",
+            "Thinking Out Loud - Ed Sheeran",
+            "At Last - Etta James",
+            "Make You Feel My Love - Adele",
+            "Perfect - Ed Sheeran"
+        ]
+    },
+    "rebellious": {
+        "genres": ["Punk Rock", "Alternative", "Grunge", "Metal"],
+        "songs": [
+            "Smells Like Teen Spirit - Nirvana",
+            "Killing in the Name - Rage Against the Machine",
+            "Basket Case - Green Day",
+            "Seven Nation Army - The White Stripes",
+            "Bohemian Rhapsody - Queen"
+        ]
+    }
+}
+
+
+CATALOG_PATH = os.environ.get("MUSIC_CATALOG")
+CATALOG_COLUMNS = ("song", "artist", "genre")
+CACHE_VERSION = 1
+TOP_GENRES = 4
+NEIGHBOR_SPREAD = 3
+NEIGHBOR_MARGIN = 0.02
+
+
+class Codes:
+    """Distinct strings plus an int32 code per row, so each string is stored once"""
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self.codes = array("i")
+
+    def add(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        self.codes.append(code)
+
+
+class Catalog:
+    """Tracks with their artist, genre and a weight per personality
+
+    Artists and genres are held as codes into lists of distinct strings,
+    and the (tracks x personalities) weights as one float32 array, which
+    is memory-mapped when the catalog comes from its binary cache. Each
+    track belongs to the personality it weighs highest.
+    """
+
+    def __init__(self, titles, artists, artist_codes, genres, genre_codes, weights,
+                 personalities=PERSONALITIES, genres_by_personality=None):
+        self.titles = titles
+        self.artists = artists
+        self.artist_codes = artist_codes
+        self.genres = genres
+        self.genre_codes = genre_codes
+        self.weights = weights
+        self.personalities = tuple(personalities)
+        self.personality_codes = weights.argmax(axis=1).astype(np.int32) if len(weights) else \
+            np.zeros(0, dtype=np.int32)
+        self.genres_by_personality = genres_by_personality or self._top_genres()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def song(self, i):
+        artist = self.artists[self.artist_codes[i]]
+        return f"{self.titles[i]} - {artist}" if artist else self.titles[i]
+
+    def _top_genres(self, count=TOP_GENRES):
+        """The most common genres among each personality's tracks"""
+        top = {}
+        for p, personality in enumerate(self.personalities):
+            codes = self.genre_codes[self.personality_codes == p]
+            counts = np.bincount(codes, minlength=len(self.genres))
+            ranked = [int(code) for code in np.argsort(-counts, kind="stable")
+                      if counts[code] and self.genres[code]]
+            top[personality] = tuple(self.genres[code] for code in ranked[:count])
+        return top
+
+    @classmethod
+    def from_database(cls, database):
+        """Build a catalog from a MUSIC_DATABASE-style dict of "Title - Artist" songs"""
+        titles, artists, genres = [], Codes(), Codes()
+        rows = []
+        column = {name: i for i, name in enumerate(PERSONALITIES)}
+        for personality, data in database.items():
+            for song in data["songs"]:
+                title, _, artist = song.rpartition(" - ")
+                titles.append(sys.intern(title or artist))
+                artists.add(artist if title else "")
+                genres.add("")
+                row = [0.0] * len(PERSONALITIES)
+                row[column[personality]] = 1.0
+                rows.append(row)
+        weights = np.array(rows, dtype=np.float32).reshape(-1, len(PERSONALITIES))
+        return cls(titles, artists.values, np.frombuffer(artists.codes, dtype=np.int32),
+                   genres.values, np.frombuffer(genres.codes, dtype=np.int32), weights,
+                   genres_by_personality={p: tuple(data["genres"]) for p, data in database.items()})
+
+    @classmethod
+    def from_csv(cls, path):
+        """Parse a CSV with song, artist and genre columns plus one weight column per personality"""
+        titles, artists, genres = [], Codes(), Codes()
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None) or []
+            missing = [name for name in CATALOG_COLUMNS + PERSONALITIES if name not in header]
+            if missing:
+                raise ValueError(f"Catalog {path} is missing columns: {', '.join(missing)}")
+            song_col, artist_col, genre_col = (header.index(name) for name in CATALOG_COLUMNS)
+            weight_cols = [header.index(name) for name in PERSONALITIES]
+            weights = array("f")
+            for line_no, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                try:
+                    weights.extend([float(row[col]) for col in weight_cols])
+                except (ValueError, IndexError):
+                    raise ValueError(f"Catalog {path}, line {line_no}: bad personality weights") from None
+                titles.append(sys.intern(row[song_col]))
+                artists.add(row[artist_col])
+                genres.add(row[genre_col])
+        return cls(titles, artists.values, np.frombuffer(artists.codes, dtype=np.int32),
+                   genres.values, np.frombuffer(genres.codes, dtype=np.int32),
+                   np.frombuffer(weights, dtype=np.float32).reshape(-1, len(PERSONALITIES)))
+
+
+def _cache_dir(path):
+    return path + ".cache"
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {"version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "personalities": list(PERSONALITIES)}
+
+
+def _write_cache(catalog, path):
+    """Save arrays as .npy (memory-mappable) and strings as one pickle; meta goes last"""
+    cache_dir = _cache_dir(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def save(name, write):
+        target = os.path.join(cache_dir, name)
+        with open(target + suffix, "wb") as f:
+            write(f)
+        os.replace(target + suffix, target)
+
+    save("weights.npy", lambda f: np.save(f, catalog.weights))
+    save("artist_codes.npy", lambda f: np.save(f, catalog.artist_codes))
+    save("genre_codes.npy", lambda f: np.save(f, catalog.genre_codes))
+    save("strings.pkl", lambda f: pickle.dump(
+        (catalog.titles, catalog.artists, catalog.genres, catalog.genres_by_personality), f,
+        protocol=pickle.HIGHEST_PROTOCOL))
+    save("meta.pkl", lambda f: pickle.dump(_source_stamp(path), f))
+
+
+def _read_cache(path):
+    """The cached catalog for path, or None if there is no up-to-date cache"""
+    cache_dir = _cache_dir(path)
+    try:
+        with open(os.path.join(cache_dir, "meta.pkl"), "rb") as f:
+            if pickle.load(f) != _source_stamp(path):
+                return None
+        with open(os.path.join(cache_dir, "strings.pkl"), "rb") as f:
+            titles, artists, genres, genres_by_personality = pickle.load(f)
+        arrays = [np.load(os.path.join(cache_dir, name), mmap_mode="r")
+                  for name in ("weights.npy", "artist_codes.npy", "genre_codes.npy")]
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return None
+    weights, artist_codes, genre_codes = arrays
+    # Pickle keeps repeated (interned) strings shared, so they load once as well
+    return Catalog(titles, artists, artist_codes, genres, genre_codes, weights,
+                   genres_by_personality=genres_by_personality)
+
+
+def read_catalog(path):
+    """Load a catalog file, from its binary cache when it is current
+
+    The first load parses the CSV and writes the cache next to it; later
+    loads (in any process) memory-map the arrays instead of parsing.
+    """
+    catalog = _read_cache(path)
+    if catalog is None:
+        catalog = Catalog.from_csv(path)
+        try:
+            _write_cache(catalog, path)
+        except OSError:
+            pass  # Read-only location: keep working from the parsed CSV
+    return catalog
+
+
+class RecommendationIndex:
+    """Track pools per personality, built once so picks don't rescan the catalog
+
+    `complements[p]` holds every track outside personality p, which is
+    what "You Might Also Like" samples from. Pools are arrays of track
+    numbers, so a pick of k songs costs O(k) whatever the catalog size.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        codes = catalog.personality_codes
+        self.pools = {personality: np.flatnonzero(codes == p).astype(np.int32)
+                      for p, personality in enumerate(catalog.personalities)}
+        self.complements = {personality: np.flatnonzero(codes != p).astype(np.int32)
+                            for p, personality in enumerate(catalog.personalities)}
+        self.all_tracks = np.arange(len(catalog), dtype=np.int32)
+        self._neighbors = None
+        self._neighbors_lock = threading.Lock()
+
+    @property
+    def neighbors(self):
+        """Vector index over every track's personality profile, built on first use"""
+        if self._neighbors is None:
+            with self._neighbors_lock:
+                if self._neighbors is None:
+                    self._neighbors = build_index(self.catalog)
+        return self._neighbors
+
+    def _sample(self, pool, count, rng):
+        picks = rng.sample(range(len(pool)), min(count, len(pool)))
+        return [self.catalog.song(int(pool[i])) for i in picks]
+
+    def songs(self, personality, count, rng=random):
+        return self._sample(self.pools[personality], count, rng)
+
+    def others(self, exclude_personality=None, count=3, rng=random):
+        return self._sample(self.complements.get(exclude_personality, self.all_tracks), count, rng)
+
+    def closest(self, scores, count, rng=random, spread=NEIGHBOR_SPREAD, margin=NEIGHBOR_MARGIN):
+        """Songs whose profile is nearest to a full score vector
+
+        Picks `count` songs, closest first, from the up to `count * spread`
+        nearest tracks that are within `margin` cosine similarity of the
+        count-th best, so equally good matches vary between sessions
+        without ever swapping in a clearly worse one.
+        """
+        tracks, similarities = self.neighbors.search(scores, count * spread)
+        if len(tracks) > count:
+            cutoff = similarities[count - 1] - margin
+            tracks = tracks[similarities >= cutoff]
+        picks = sorted(rng.sample(range(len(tracks)), min(count, len(tracks))))
+        return [self.catalog.song(int(tracks[i])) for i in picks]
+
+    def recommend(self, personality, rng=random, songs=3, also_like=2, scores=None):
+        """Genres, songs and "you might also like" picks for a personality type
+
+        With the full score vector, songs are the nearest neighbours of the
+        whole profile instead of random picks from the winning personality.
+        """
+        if scores is not None and np.any(scores):
+            picks = self.closest(scores, songs, rng)
+        else:
+            picks = self.songs(personality, songs, rng)
+        return {
+            "genres": list(self.catalog.genres_by_personality.get(personality, ())),
+            "songs": picks,
+            # Neighbours can come from other personalities, so skip any already picked
+            "also_like": [song for song in self.others(personality, also_like + len(picks), rng)
+                          if song not in picks][:also_like],
+        }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_recommendation_index(path=None):
+    """The process-wide recommendation index for a catalog file (or the built-in one)
+
+    Loaded on first use and shared by every caller afterwards, so a large
+    catalog is read once per process, not once per session or rerun.
+    """
+    path = path or CATALOG_PATH
+    key = os.path.abspath(path) if path else None
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                catalog = read_catalog(path) if path else Catalog.from_database(MUSIC_DATABASE)
+                index = _indexes[key] = RecommendationIndex(catalog)
+    return index
+
+
+def recommend(personality, rng=random, songs=3, also_like=2, scores=None):
+    return get_recommendation_index().recommend(personality, rng, songs, also_like, scores)
@@ -0,0 +1,112 @@
+import numpy as np
+
+# Catalogs up to this size are searched exhaustively; larger ones get an IVF index
+EXACT_LIMIT = 50_000
+# How strongly a song's genre pulls its vector toward that genre's average profile
+GENRE_WEIGHT = 0.5
+ASSIGN_BLOCK = 65_536
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def song_features(catalog, genre_weight=GENRE_WEIGHT):
+    """Unit vectors in personality space, one per track
+
+    Each track's personality weights are blended with the average profile
+    of its genre, so tracks with sparse weights still lean toward the
+    personalities their genre is popular with. Tracks without a genre
+    keep their own weights.
+    """
+    weights = normalize(catalog.weights)
+    if not len(weights) or genre_weight == 0:
+        return weights
+    codes = np.asarray(catalog.genre_codes)
+    centroids = np.stack([np.bincount(codes, weights=weights[:, d], minlength=len(catalog.genres))
+                          for d in range(weights.shape[1])], axis=1)
+    centroids = normalize(centroids)
+    for code, genre in enumerate(catalog.genres):
+        if not genre:
+            centroids[code] = 0
+    return normalize(weights + genre_weight * centroids[codes])
+
+
+def top_k(similarities, k):
+    """Positions of the k largest similarities, best first (ties keep the lower position)"""
+    k = min(k, len(similarities))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    if k < len(similarities):
+        candidates = np.argpartition(-similarities, k - 1)[:k]
+    else:
+        candidates = np.arange(len(similarities))
+    order = np.lexsort((candidates, -similarities[candidates]))
+    return candidates[order]
+
+
+class ExactIndex:
+    """Brute-force cosine search: one matrix-vector product over every track"""
+
+    def __init__(self, features):
+        self.features = features
+
+    def search(self, query, k):
+        """(track numbers, similarities) of the k tracks closest to the query, best first"""
+        query = normalize(query)
+        similarities = self.features @ query
+        found = top_k(similarities, k)
+        return found, similarities[found]
+
+
+class IVFIndex:
+    """Approximate cosine search over k-means clusters (an inverted-file index)
+
+    Tracks are grouped under the nearest of ~sqrt(N) centroids found with
+    spherical k-means on a sample. A query scores the centroids, then
+    only the tracks in the `n_probe` closest clusters, and reranks those
+    exactly.
+    """
+
+    def __init__(self, features, n_lists=None, n_probe=8, iterations=10, sample=100_000, seed=0):
+        rng = np.random.default_rng(seed)
+        self.features = features
+        self.n_probe = n_probe
+        n_lists = min(n_lists or max(1, int(np.sqrt(len(features)))), len(features))
+        train = features[np.sort(rng.choice(len(features), min(sample, len(features)), replace=False))]
+        centroids = train[rng.choice(len(train), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = (train @ centroids.T).argmax(axis=1)
+            sums = np.stack([np.bincount(assignment, weights=train[:, d], minlength=n_lists)
+                             for d in range(train.shape[1])], axis=1)
+            filled = np.bincount(assignment, minlength=n_lists) > 0
+            centroids[filled] = normalize(sums[filled])
+        self.centroids = centroids
+
+        assignment = np.empty(len(features), dtype=np.int32)
+        for start in range(0, len(features), ASSIGN_BLOCK):
+            block = features[start:start + ASSIGN_BLOCK]
+            assignment[start:start + ASSIGN_BLOCK] = (block @ centroids.T).argmax(axis=1)
+        # Track numbers grouped by cluster; cluster c is order[offsets[c]:offsets[c + 1]]
+        self.order = np.argsort(assignment, kind="stable").astype(np.int32)
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(n_lists + 1))
+        self.clustered = features[self.order]
+
+    def search(self, query, k):
+        query = normalize(query)
+        lists = top_k(self.centroids @ query, self.n_probe)
+        spans = [(self.offsets[c], self.offsets[c + 1]) for c in np.sort(lists)]
+        positions = np.concatenate([np.arange(start, end) for start, end in spans])
+        similarities = self.clustered[positions] @ query
+        found = top_k(similarities, k)
+        tracks = self.order[positions[found]]
+        return tracks, similarities[found]
+
+
+def build_index(catalog, exact_limit=EXACT_LIMIT):
+    features = song_features(catalog)
+    if len(features) <= exact_limit:
+        return ExactIndex(features)
+    return IVFIndex(features)
@@ -1,17 +1,18 @@
 import streamlit as st
+import html
+import os
 import random
 import time
+import uuid
 
-# Set page config for better visuals
-st.set_page_config(
-    page_title="🎵 Music Personality Quiz",
-    page_icon="🎵",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
+from music_catalog import recommend
+from quiz_analytics import QuizAnalytics
+from quiz_engine import ENGINE, QUIZ
 
-# Custom CSS for better styling
-st.markdown("""
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYTICS_PATH = os.environ.get("QUIZ_ANALYTICS_PATH", os.path.join(APP_DIR, "quiz_analytics.json"))
+
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 3rem;
@@ -43,148 +44,107 @@ st.markdown("""
         border-left: 4px solid #FFD93D;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-# Music database organized by personality types
-MUSIC_DATABASE = {
-    "adventurous": {
-        "genres": ["Electronic", "World Music", "Experimental", "Jazz Fusion"],
-        "songs": [
-            "Strobe - Deadmau5",
-            "Bambaataa - Shpongle",
-            "Teardrop - Massive Attack",
-            "Windowlicker - Aphex Twin",
-            "Kiara - Bonobo"
-        ]
-    },
-    "chill": {
-        "genres": ["Lo-fi", "Ambient", "Indie Folk", "Neo-Soul"],
-        "songs": [
-            "Girl - Syml",
-            "Holocene - Bon Iver",
-            "Breathe Me - Sia",
-            "Mad World - Gary Jules",
-            "Skinny Love - Bon Iver"
-        ]
-    },
-    "energetic": {
-        "genres": ["Pop", "Dance", "Rock", "Hip-Hop"],
-        "songs": [
-            "Uptown Funk - Bruno Mars",
-            "Can't Stop the Feeling - Justin Timberlake",
-            "Good as Hell - Lizzo",
-            "Shut Up and Dance - Walk the Moon",
-            "Happy - Pharrell Williams"
-        ]
-    },
-    "romantic": {
-        "genres": ["R&B", "Soft Rock", "Acoustic", "Soul"],
-        "songs": [
-            "All of Me - John Legend",
-            "Thinking Out Loud - Ed Sheeran",
-            "At Last - Etta James",
-            "Make You Feel My Love - Adele",
-            "Perfect - Ed Sheeran"
-        ]
-    },
-    "rebellious": {
-        "genres": ["Punk Rock", "Alternative", "Grunge", "Metal"],
-        "songs": [
-            "Smells Like Teen Spirit - Nirvana",
-            "Killing in the Name - Rage Against the Machine",
-            "Basket Case - Green Day",
-            "Seven Nation Army - The White Stripes",
-            "Bohemian Rhapsody - Queen"
-        ]
-    }
+WELCOME_MARKDOWN = """
+### Welcome to the Music Personality Quiz! 🎶
+
+Discover your unique music personality and get personalized song recommendations 
+based on your preferences and lifestyle choices.
+
+**How it works:**
+1. Answer a few fun questions about yourself
+2. We'll analyze your personality type
+3. Get personalized music recommendations
+4. Discover new songs you might love!
+"""
+
+# Set page config for better visuals
+st.set_page_config(
+    page_title="🎵 Music Personality Quiz",
+    page_icon="🎵",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# Custom CSS for better styling
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+PERSONALITY_DESCRIPTIONS = {
+    "adventurous": "🌟 You're an Explorer! You love discovering new sounds and pushing musical boundaries.",
+    "chill": "😌 You're a Zen Master! You appreciate calm, soothing music that helps you relax.",
+    "energetic": "⚡ You're a Dynamo! You love upbeat music that gets you moving and dancing.",
+    "romantic": "💕 You're a Romantic! You're drawn to heartfelt music that touches your soul.",
+    "rebellious": "🔥 You're a Rebel! You love music with attitude and powerful messages."
 }
 
+@st.cache_resource
+def get_quiz_analytics(path):
+    return QuizAnalytics(QUIZ, path)
+
 def initialize_session_state():
     """Initialize session state variables"""
+    if 'user_id' not in st.session_state:
+        st.session_state.user_id = uuid.uuid4().hex
     if 'quiz_started' not in st.session_state:
         st.session_state.quiz_started = False
     if 'current_question' not in st.session_state:
         st.session_state.current_question = 0
+    if 'adaptive' not in st.session_state:
+        st.session_state.adaptive = False
+    if 'question_order' not in st.session_state:
+        st.session_state.question_order = [0]
     if 'answers' not in st.session_state:
         st.session_state.answers = []
     if 'quiz_completed' not in st.session_state:
         st.session_state.quiz_completed = False
     if 'personality_type' not in st.session_state:
         st.session_state.personality_type = None
+    if 'personality_scores' not in st.session_state:
+        st.session_state.personality_scores = None
+    if 'recommendation_seed' not in st.session_state:
+        st.session_state.recommendation_seed = random.getrandbits(32)
+    if 'recommendations' not in st.session_state:
+        st.session_state.recommendations = {}
 
-def get_random_songs(exclude_personality=None, count=3):
-    """Get random songs from all categories except specified one"""
-    all_songs = []
-    for personality, data in MUSIC_DATABASE.items():
-        if personality != exclude_personality:
-            all_songs.extend(data["songs"])
-    return random.sample(all_songs, min(count, len(all_songs)))
+def get_recommendations(personality_type):
+    """Pick this session's recommendations once, so reruns show the same songs"""
+    if personality_type not in st.session_state.recommendations:
+        rng = random.Random(st.session_state.recommendation_seed)
+        st.session_state.recommendations[personality_type] = recommend(
+            personality_type, rng, scores=st.session_state.personality_scores
+        )
+    return st.session_state.recommendations[personality_type]
 
-def calculate_personality(answers):
-    """Calculate personality type based on quiz answers"""
-    # Simple scoring system based on answer patterns
-    scores = {
-        "adventurous": 0,
-        "chill": 0,
-        "energetic": 0,
-        "romantic": 0,
-        "rebellious": 0
-    }
-    
-    # Question 1: Weekend activity
-    if answers[0] == "Try a new adventure sport":
-        scores["adventurous"] += 2
-    elif answers[0] == "Read a book in a quiet café":
-        scores["chill"] += 2
-    elif answers[0] == "Go to a party or club":
-        scores["energetic"] += 2
-    elif answers[0] == "Have a romantic dinner":
-        scores["romantic"] += 2
-    elif answers[0] == "Attend a rock concert":
-        scores["rebellious"] += 2
-    
-    # Question 2: Color preference
-    if answers[1] == "Bright Orange":
-        scores["adventurous"] += 1
-        scores["energetic"] += 1
-    elif answers[1] == "Soft Blue":
-        scores["chill"] += 2
-    elif answers[1] == "Electric Purple":
-        scores["energetic"] += 1
-        scores["rebellious"] += 1
-    elif answers[1] == "Warm Pink":
-        scores["romantic"] += 2
-    elif answers[1] == "Deep Black":
-        scores["rebellious"] += 2
-    
-    # Question 3: Movie genre
-    if answers[2] == "Action/Adventure":
-        scores["adventurous"] += 1
-        scores["energetic"] += 1
-    elif answers[2] == "Drama/Indie":
-        scores["chill"] += 2
-    elif answers[2] == "Comedy":
-        scores["energetic"] += 2
-    elif answers[2] == "Romance":
-        scores["romantic"] += 2
-    elif answers[2] == "Horror/Thriller":
-        scores["rebellious"] += 2
-    
-    # Question 4: Social setting
-    if answers[3] == "Large group party":
-        scores["energetic"] += 2
-    elif answers[3] == "Small intimate gathering":
-        scores["romantic"] += 1
-        scores["chill"] += 1
-    elif answers[3] == "Solo time":
-        scores["chill"] += 2
-    elif answers[3] == "Underground venue":
-        scores["rebellious"] += 2
-    elif answers[3] == "Outdoor adventure":
-        scores["adventurous"] += 2
-    
-    # Return the personality type with the highest score
-    return max(scores, key=scores.get)
+def pick_next_question(asked, answers):
+    """Index of the next question to ask, or None when the quiz is over
+
+    In adaptive mode the quiz ends as soon as the winner can no longer
+    change, and otherwise asks whichever question best separates the
+    current leaders; the result always matches answering everything.
+    """
+    if st.session_state.adaptive:
+        scores = ENGINE.partial_scores(asked, answers)
+        if ENGINE.is_decided(scores, asked):
+            return None
+        return ENGINE.next_question(scores, asked)
+    next_question = asked[-1] + 1
+    return next_question if next_question < ENGINE.num_questions else None
+
+def finish_quiz(asked, answers):
+    """Score the answered questions and record the result"""
+    scores = ENGINE.partial_scores(asked, answers)
+    st.session_state.personality_scores = scores.tolist()
+    st.session_state.personality_type = ENGINE.personalities[ENGINE.leader(scores)]
+    st.session_state.quiz_completed = True
+    choices = [None] * ENGINE.num_questions
+    for question, choice in zip(asked, ENGINE.encode_row_for(asked, answers)):
+        choices[question] = choice
+    get_quiz_analytics(ANALYTICS_PATH).record(
+        choices,
+        st.session_state.personality_type,
+        st.session_state.user_id
+    )
 
 def display_quiz_question(question_num, question, options):
     """Display a quiz question with options"""
@@ -201,47 +161,56 @@ def display_quiz_question(question_num, question, options):
     st.markdown("</div>", unsafe_allow_html=True)
     return answer
 
+def result_header_html(personality_type):
+    """Static result banner for a personality type"""
+    return (
+        "<div class='result-container'>"
+        f"<h2>Your Music Personality: {html.escape(personality_type.title(), quote=False)}</h2>"
+        f"<h3>{html.escape(PERSONALITY_DESCRIPTIONS[personality_type], quote=False)}</h3>"
+        "</div>"
+    )
+
+def cards_html(icon, items):
+    """One block of music cards, so a list renders as a single element"""
+    return "".join(f"<div class='music-card'>{icon} {html.escape(item, quote=False)}</div>" for item in items)
+
+@st.cache_data
+def genre_cards_html(personality_type, _genres):
+    """Genre cards, built once per personality: the genres are fixed, unlike the sampled songs"""
+    return cards_html("🎭", _genres)
+
 def display_results(personality_type):
     """Display the quiz results with music recommendations"""
-    st.markdown("<div class='result-container'>", unsafe_allow_html=True)
-    
-    # Personality descriptions
-    descriptions = {
-        "adventurous": "🌟 You're an Explorer! You love discovering new sounds and pushing musical boundaries.",
-        "chill": "😌 You're a Zen Master! You appreciate calm, soothing music that helps you relax.",
-        "energetic": "⚡ You're a Dynamo! You love upbeat music that gets you moving and dancing.",
-        "romantic": "💕 You're a Romantic! You're drawn to heartfelt music that touches your soul.",
-        "rebellious": "🔥 You're a Rebel! You love music with attitude and powerful messages."
-    }
-    
-    st.markdown(f"## Your Music Personality: {personality_type.title()}")
-    st.markdown(f"### {descriptions[personality_type]}")
-    st.markdown("</div>", unsafe_allow_html=True)
+    st.markdown(result_header_html(personality_type), unsafe_allow_html=True)
     
     # Display recommended music
     st.markdown("## 🎵 Your Personalized Music Recommendations")
     
-    music_data = MUSIC_DATABASE[personality_type]
+    recommendations = get_recommendations(personality_type)
     
     # Show recommended genres
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("### 🎼 Recommended Genres")
-        for genre in music_data["genres"]:
-            st.markdown(f"<div class='music-card'>🎭 {genre}</div>", unsafe_allow_html=True)
+        st.markdown(genre_cards_html(personality_type, recommendations["genres"]), unsafe_allow_html=True)
     
     with col2:
         st.markdown("### 🎤 Song Recommendations")
-        recommended_songs = random.sample(music_data["songs"], min(3, len(music_data["songs"])))
-        for song in recommended_songs:
-            st.markdown(f"<div class='music-card'>🎵 {song}</div>", unsafe_allow_html=True)
+        st.markdown(cards_html("🎵", recommendations["songs"]), unsafe_allow_html=True)
     
     # Show some random songs from other categories as "You might also like"
     st.markdown("### 🔀 You Might Also Like")
-    random_songs = get_random_songs(exclude_personality=personality_type, count=2)
-    for song in random_songs:
-        st.markdown(f"<div class='music-card'>🎵 {song}</div>", unsafe_allow_html=True)
+    st.markdown(cards_html("🎵", recommendations["also_like"]), unsafe_allow_html=True)
+    
+    display_community_stats()
+
+def display_community_stats():
+    """How everyone's results are spread, from the shared analytics"""
+    summary = get_quiz_analytics(ANALYTICS_PATH).summary()
+    with st.expander(f"📊 How everyone scored ({summary['completed']} quizzes, "
+                     f"~{summary['distinct_users']} people)"):
+        st.bar_chart({personality.title(): count for personality, count in summary["personalities"].items()})
 
 def main():
     """Main application function"""
@@ -250,67 +219,19 @@ def main():
     # Main header
     st.markdown("<h1 class='main-header'>🎵 Music Personality Quiz 🎵</h1>", unsafe_allow_html=True)
     
-    # Quiz questions
-    questions = [
-        {
-            "question": "What's your ideal weekend activity?",
-            "options": [
-                "Try a new adventure sport",
-                "Read a book in a quiet café",
-                "Go to a party or club",
-                "Have a romantic dinner",
-                "Attend a rock concert"
-            ]
-        },
-        {
-            "question": "Which color speaks to you most?",
-            "options": [
-                "Bright Orange",
-                "Soft Blue", 
-                "Electric Purple",
-                "Warm Pink",
-                "Deep Black"
-            ]
-        },
-        {
-            "question": "What's your favorite movie genre?",
-            "options": [
-                "Action/Adventure",
-                "Drama/Indie",
-                "Comedy",
-                "Romance",
-                "Horror/Thriller"
-            ]
-        },
-        {
-            "question": "Where do you feel most comfortable?",
-            "options": [
-                "Large group party",
-                "Small intimate gathering",
-                "Solo time",
-                "Underground venue",
-                "Outdoor adventure"
-            ]
-        }
-    ]
+    questions = QUIZ.questions
     
     if not st.session_state.quiz_started:
         # Welcome screen
-        st.markdown("""
-        ### Welcome to the Music Personality Quiz! 🎶
+        st.markdown(WELCOME_MARKDOWN)
         
-        Discover your unique music personality and get personalized song recommendations 
-        based on your preferences and lifestyle choices.
-        
-        **How it works:**
-        1. Answer a few fun questions about yourself
-        2. We'll analyze your personality type
-        3. Get personalized music recommendations
-        4. Discover new songs you might love!
-        """)
+        adaptive = st.toggle("⚡ Quick mode: stop as soon as your result is certain")
         
         if st.button("🚀 Start the Quiz!", use_container_width=True):
             st.session_state.quiz_started = True
+            st.session_state.adaptive = adaptive
+            if adaptive:
+                st.session_state.question_order = [ENGINE.next_question([0] * len(ENGINE.personalities), [])]
             st.rerun()
     
     elif not st.session_state.quiz_completed:
@@ -318,12 +239,12 @@ def main():
         progress = (st.session_state.current_question + 1) / len(questions)
         st.progress(progress)
         
-        if st.session_state.current_question < len(questions):
-            current_q = questions[st.session_state.current_question]
+        if st.session_state.current_question < len(st.session_state.question_order):
+            current_q = questions[st.session_state.question_order[st.session_state.current_question]]
             answer = display_quiz_question(
                 st.session_state.current_question,
-                current_q["question"],
-                current_q["options"]
+                current_q.text,
+                current_q.options
             )
             
             col1, col2, col3 = st.columns([1, 1, 1])
@@ -337,11 +258,15 @@ def main():
                         st.session_state.answers[st.session_state.current_question] = answer
                     
                     st.session_state.current_question += 1
+                    asked = st.session_state.question_order[:st.session_state.current_question]
+                    answers = st.session_state.answers[:st.session_state.current_question]
+                    next_question = pick_next_question(asked, answers)
                     
-                    if st.session_state.current_question >= len(questions):
+                    if next_question is None:
                         # Quiz completed, calculate personality
-                        st.session_state.personality_type = calculate_personality(st.session_state.answers)
-                        st.session_state.quiz_completed = True
+                        finish_quiz(asked, answers)
+                    else:
+                        st.session_state.question_order.append(next_question)
                     
                     st.rerun()
     
@@ -354,9 +279,10 @@ def main():
         col1, col2, col3 = st.columns([1, 1, 1])
         with col2:
             if st.button("🔄 Take Quiz Again", use_container_width=True):
-                # Reset all session state
+                # Reset all session state, but stay the same user for analytics
                 for key in list(st.session_state.keys()):
-                    del st.session_state[key]
+                    if key != 'user_id':
+                        del st.session_state[key]
                 st.rerun()
 
 if __name__ == "__main__":
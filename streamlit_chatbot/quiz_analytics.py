@@ -0,0 +1,221 @@
+import atexit
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+FLUSH_SECONDS = 30
+TOP_PATHS = 10
+SKIPPED = "x"
+
+
+def _hash64(key, salt=b""):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8, salt=salt).digest(), "big")
+
+
+def _path_key(choices):
+    return "-".join(SKIPPED if choice is None else str(choice) for choice in choices)
+
+
+class CountMinSketch:
+    """Approximate counts of arbitrary keys in a fixed depth x width table
+
+    Estimates never undercount; they overcount by at most
+    e * total / width with probability 1 - e^-depth.
+    """
+
+    def __init__(self, width=2048, depth=4, table=None):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64) if table is None else table
+        self._salts = [row.to_bytes(2, "big") for row in range(depth)]
+
+    def _columns(self, key):
+        return [_hash64(key, salt) % self.width for salt in self._salts]
+
+    def add(self, key, count=1):
+        columns = self._columns(key)
+        self.table[np.arange(self.depth), columns] += count
+        return int(self.table[np.arange(self.depth), columns].min())
+
+    def estimate(self, key):
+        return int(self.table[np.arange(self.depth), self._columns(key)].min())
+
+
+class HyperLogLog:
+    """Approximate count of distinct items in 2**precision one-byte registers
+
+    With the default precision of 12 (4 KB) the standard error is about 1.6%.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = np.zeros(self.size, dtype=np.uint8) if registers is None else registers
+
+    def add(self, item):
+        value = _hash64(item)
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / float(np.sum(np.power(2.0, -self.registers.astype(np.float64))))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.size and empty:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = self.size * math.log(self.size / empty)
+        return int(round(estimate))
+
+
+class QuizAnalytics:
+    """Constant-memory aggregates of completed quizzes, shared by all sessions
+
+    Keeps a personality histogram, option counts per question, a
+    count-min sketch of whole answer paths (plus the few most common
+    paths), and a HyperLogLog of distinct users. Recording a quiz is O(1)
+    and thread-safe; aggregates are written to `path` at most every
+    `flush_seconds` and at exit, and reloaded from it on start.
+    """
+
+    def __init__(self, quiz, path=None, flush_seconds=FLUSH_SECONDS):
+        self.quiz = quiz
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps an older snapshot from overwriting a newer one
+        self.completed = 0
+        self.personalities = np.zeros(len(quiz.personalities), dtype=np.int64)
+        self.option_counts = [np.zeros(len(question.options), dtype=np.int64) for question in quiz.questions]
+        self.paths = CountMinSketch()
+        self.users = HyperLogLog()
+        self.top_paths = {}  # answer path -> estimated count, at most TOP_PATHS entries
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        if path and os.path.exists(path):
+            self._load(path)
+        if path:
+            atexit.register(self.flush)
+
+    def record(self, choices, personality, user_id):
+        """Add one completed quiz: option indices per question, the result and who took it
+
+        A question skipped by an adaptive quiz has None as its choice.
+        """
+        path_key = _path_key(choices)
+        personality_index = self.quiz.personalities.index(personality)
+        with self._lock:
+            self.completed += 1
+            self.personalities[personality_index] += 1
+            for counts, choice in zip(self.option_counts, choices):
+                if choice is not None:
+                    counts[choice] += 1
+            estimate = self.paths.add(path_key)
+            self._track_top_path(path_key, estimate)
+            self.users.add(str(user_id))
+            self._dirty = True
+            due = time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def _track_top_path(self, path_key, estimate):
+        if path_key in self.top_paths or len(self.top_paths) < TOP_PATHS:
+            self.top_paths[path_key] = estimate
+            return
+        smallest = min(self.top_paths, key=self.top_paths.get)
+        if estimate > self.top_paths[smallest]:
+            del self.top_paths[smallest]
+            self.top_paths[path_key] = estimate
+
+    def summary(self):
+        """Plain-dict snapshot of the aggregates, with option texts instead of indices"""
+        with self._lock:
+            top = sorted(self.top_paths.items(), key=lambda item: -item[1])
+            return {
+                "completed": self.completed,
+                "distinct_users": self.users.count(),
+                "personalities": dict(zip(self.quiz.personalities, self.personalities.tolist())),
+                "options": [
+                    dict(zip(question.options, counts.tolist()))
+                    for question, counts in zip(self.quiz.questions, self.option_counts)
+                ],
+                "top_paths": [
+                    ([None if choice == SKIPPED else question.options[int(choice)]
+                      for question, choice in zip(self.quiz.questions, path_key.split("-"))], count)
+                    for path_key, count in top
+                ],
+            }
+
+    def _state(self):
+        return {
+            "completed": self.completed,
+            "personalities": dict(zip(self.quiz.personalities, self.personalities.tolist())),
+            "options": [dict(zip(question.options, counts.tolist()))
+                        for question, counts in zip(self.quiz.questions, self.option_counts)],
+            "paths": {"width": self.paths.width, "depth": self.paths.depth,
+                      "table": base64.b64encode(self.paths.table.tobytes()).decode("ascii")},
+            "users": {"precision": self.users.precision,
+                      "registers": base64.b64encode(self.users.registers.tobytes()).decode("ascii")},
+            "top_paths": dict(self.top_paths),
+        }
+
+    def _load(self, path):
+        """Restore saved aggregates; counts for options no longer in the quiz are dropped"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            paths = state["paths"]
+            table = np.frombuffer(base64.b64decode(paths["table"]), dtype=np.int64)
+            users = state["users"]
+            registers = np.frombuffer(base64.b64decode(users["registers"]), dtype=np.uint8)
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        self.completed = state.get("completed", 0)
+        saved = state.get("personalities", {})
+        for i, personality in enumerate(self.quiz.personalities):
+            self.personalities[i] = saved.get(personality, 0)
+        for question, counts, saved in zip(self.quiz.questions, self.option_counts, state.get("options", [])):
+            for i, option in enumerate(question.options):
+                counts[i] = saved.get(option, 0)
+        self.paths = CountMinSketch(paths["width"], paths["depth"],
+                                    table.reshape(paths["depth"], paths["width"]).copy())
+        self.users = HyperLogLog(users["precision"], registers.copy())
+        sizes = [len(question.options) for question in self.quiz.questions]
+        self.top_paths = {
+            path_key: count for path_key, count in state.get("top_paths", {}).items()
+            if self._valid_path(path_key, sizes)
+        }
+
+    @staticmethod
+    def _valid_path(path_key, sizes):
+        parts = path_key.split("-")
+        return len(parts) == len(sizes) and all(
+            part == SKIPPED or part.isdigit() and int(part) < size for part, size in zip(parts, sizes))
+
+    def flush(self):
+        """Write the aggregates to disk if anything changed since the last flush"""
+        if not self.path:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                state = self._state()
+                self._dirty = False
+                self._last_flush = time.monotonic()
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                with self._lock:
+                    self._dirty = True
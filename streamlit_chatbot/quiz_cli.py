@@ -0,0 +1,203 @@
+"""Score quiz answers in bulk, outside the Streamlit app
+
+Reads a CSV or NDJSON file of answer rows and writes one result per row
+with the personality type and music recommendations. Rows are streamed
+in chunks, so memory stays bounded however large the input is; with
+--workers the chunks are scored across a process pool, keeping only a
+few chunks in flight at a time.
+
+Input rows give one answer per question, either as columns/keys
+q1..qN or (NDJSON) as an "answers" list; an optional "id" is carried
+through. Output is NDJSON, or CSV when the output path ends in .csv.
+
+Usage: python quiz_cli.py answers.csv results.ndjson [--chunk-size 50000] [--workers 4]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from music_catalog import get_recommendation_index
+from quiz_engine import ENGINE
+
+CHUNK_SIZE = 50_000
+OUTPUT_FIELDS = ("id", "personality", "genres", "songs", "also_like", "error")
+
+
+def answer_columns(count):
+    return [f"q{i + 1}" for i in range(count)]
+
+
+def iter_csv_rows(f):
+    reader = csv.DictReader(f)
+    columns = answer_columns(ENGINE.num_questions)
+    for line_no, row in enumerate(reader, start=1):
+        yield row.get("id") or str(line_no), [row.get(column) for column in columns]
+
+
+def iter_ndjson_rows(f):
+    columns = answer_columns(ENGINE.num_questions)
+    for line_no, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield str(line_no), None
+            continue
+        if not isinstance(row, dict):
+            yield str(line_no), None
+            continue
+        answers = row.get("answers")
+        if answers is None:
+            answers = [row.get(column) for column in columns]
+        yield str(row.get("id", line_no)), answers
+
+
+def iter_rows(f, path):
+    """(id, answers) pairs from a CSV or NDJSON file, chosen by extension"""
+    if path.lower().endswith(".csv"):
+        return iter_csv_rows(f)
+    return iter_ndjson_rows(f)
+
+
+def iter_chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_chunk(chunk, seed=None, catalog_path=None):
+    """Score one chunk of (id, answers) rows and attach recommendations
+
+    Answers are encoded row by row so that one bad row only fails itself,
+    then the whole chunk is classified with a single engine call.
+    """
+    rng = random.Random(seed)
+    index = get_recommendation_index(catalog_path)
+    results = [None] * len(chunk)
+    valid = []
+    choices = []
+    for i, (row_id, answers) in enumerate(chunk):
+        try:
+            if not isinstance(answers, list):
+                raise ValueError("Missing answers")
+            choices.append(ENGINE.encode_row(answers))
+            valid.append(i)
+        except ValueError as e:
+            results[i] = {"id": row_id, "error": str(e)}
+    if valid:
+        scores = ENGINE.scores(np.array(choices, dtype=np.intp))
+        for i, row_scores in zip(valid, scores):
+            personality = ENGINE.personalities[int(row_scores.argmax())]
+            results[i] = {"id": chunk[i][0], "personality": personality,
+                          **index.recommend(personality, rng, scores=row_scores)}
+    return results
+
+
+def format_ndjson(results):
+    return "".join(json.dumps(result, ensure_ascii=False) + "\n" for result in results)
+
+
+def format_csv(results):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=OUTPUT_FIELDS)
+    for result in results:
+        row = dict(result)
+        for key in ("genres", "songs", "also_like"):
+            if key in row:
+                row[key] = "; ".join(row[key])
+        writer.writerow(row)
+    return out.getvalue()
+
+
+def process_chunk(chunk, seed, fmt, catalog_path=None):
+    """Score and serialize one chunk; returns (text, rows, errors)
+
+    Serializing here rather than in the parent keeps the parent down to
+    reading input and writing finished text when running on a pool.
+    """
+    results = score_chunk(chunk, seed, catalog_path)
+    errors = sum("error" in result for result in results)
+    text = format_csv(results) if fmt == "csv" else format_ndjson(results)
+    return text, len(results), errors
+
+
+def iter_processed(chunks, workers, seed, fmt, catalog_path=None):
+    """Yield processed chunks in input order, with at most 2 chunks per worker in flight"""
+    chunk_seed = (lambda n: None) if seed is None else (lambda n: seed * 1_000_003 + n)
+    if workers <= 1:
+        for n, chunk in enumerate(chunks):
+            yield process_chunk(chunk, chunk_seed(n), fmt, catalog_path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for n, chunk in enumerate(chunks):
+            pending.append(pool.submit(process_chunk, chunk, chunk_seed(n), fmt, catalog_path))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run(input_path, output_path, chunk_size=CHUNK_SIZE, workers=1, seed=None, catalog_path=None,
+        progress=sys.stderr):
+    """Score every row of input_path into output_path; returns (rows, errors, seconds)"""
+    # Load (and cache) the catalog before starting workers; they reuse the cache file
+    get_recommendation_index(catalog_path)
+    rows = errors = 0
+    started = time.perf_counter()
+    with open(input_path, encoding="utf-8-sig", newline="") as src, \
+            open(output_path, "w", encoding="utf-8", newline="") as dst:
+        fmt = "csv" if output_path.lower().endswith(".csv") else "ndjson"
+        if fmt == "csv":
+            csv.DictWriter(dst, fieldnames=OUTPUT_FIELDS).writeheader()
+        chunks = iter_chunks(iter_rows(src, input_path), chunk_size)
+        for text, chunk_rows, chunk_errors in iter_processed(chunks, workers, seed, fmt, catalog_path):
+            dst.write(text)
+            rows += chunk_rows
+            errors += chunk_errors
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress.write(f"\r{rows:,} rows, {rows / elapsed:,.0f} rows/s")
+                progress.flush()
+    elapsed = time.perf_counter() - started
+    if progress:
+        progress.write("\n")
+    return rows, errors, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV or NDJSON file of answer rows")
+    parser.add_argument("output", help="results file (.ndjson, or .csv)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows scored per chunk")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=f"processes to score with (default 1; this machine has {os.cpu_count()})")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed song picks so reruns give the same recommendations")
+    parser.add_argument("--catalog", default=None,
+                        help="music catalog CSV to recommend from (default: $MUSIC_CATALOG or built-in)")
+    args = parser.parse_args(argv)
+
+    rows, errors, elapsed = run(args.input, args.output, args.chunk_size, args.workers, args.seed,
+                               args.catalog)
+    rate = rows / elapsed if elapsed else 0
+    print(f"Scored {rows:,} rows ({errors:,} invalid) in {elapsed:.1f}s - {rate:,.0f} rows/s")
+    return 1 if rows and errors == rows else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+import numpy as np
+
+# Column order of the weight matrix; ties go to the personality listed first
+PERSONALITIES = ("adventurous", "chill", "energetic", "romantic", "rebellious")
+
+# Each option lists the points it gives to one or more personalities
+QUESTIONS = [
+    {
+        "question": "What's your ideal weekend activity?",
+        "options": {
+            "Try a new adventure sport": {"adventurous": 2},
+            "Read a book in a quiet café": {"chill": 2},
+            "Go to a party or club": {"energetic": 2},
+            "Have a romantic dinner": {"romantic": 2},
+            "Attend a rock concert": {"rebellious": 2},
+        },
+    },
+    {
+        "question": "Which color speaks to you most?",
+        "options": {
+            "Bright Orange": {"adventurous": 1, "energetic": 1},
+            "Soft Blue": {"chill": 2},
+            "Electric Purple": {"energetic": 1, "rebellious": 1},
+            "Warm Pink": {"romantic": 2},
+            "Deep Black": {"rebellious": 2},
+        },
+    },
+    {
+        "question": "What's your favorite movie genre?",
+        "options": {
+            "Action/Adventure": {"adventurous": 1, "energetic": 1},
+            "Drama/Indie": {"chill": 2},
+            "Comedy": {"energetic": 2},
+            "Romance": {"romantic": 2},
+            "Horror/Thriller": {"rebellious": 2},
+        },
+    },
+    {
+        "question": "Where do you feel most comfortable?",
+        "options": {
+            "Large group party": {"energetic": 2},
+            "Small intimate gathering": {"romantic": 1, "chill": 1},
+            "Solo time": {"chill": 2},
+            "Underground venue": {"rebellious": 2},
+            "Outdoor adventure": {"adventurous": 2},
+        },
+    },
+]
+
+
+class Question(NamedTuple):
+    text: str
+    options: tuple  # option texts, in display order
+    option_index: Mapping  # option text -> position in `options`
+    points: tuple  # per option, the points for each personality in quiz order
+
+
+class Quiz(NamedTuple):
+    personalities: tuple
+    questions: tuple
+
+
+def compile_quiz(questions=QUESTIONS, personalities=PERSONALITIES):
+    """Validate a question table and freeze it into a Quiz
+
+    Raises ValueError for an empty quiz, a question without text or with
+    fewer than two options, or points for an unknown personality or that
+    aren't non-negative integers.
+    """
+    personalities = tuple(personalities)
+    column = {name: i for i, name in enumerate(personalities)}
+    if not questions:
+        raise ValueError("A quiz needs at least one question")
+    compiled = []
+    for number, question in enumerate(questions, start=1):
+        text = question.get("question")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"Question {number} has no text")
+        options = question.get("options") or {}
+        if len(options) < 2:
+            raise ValueError(f"Question {number} needs at least two options")
+        points = []
+        for option, option_points in options.items():
+            row = [0] * len(personalities)
+            for personality, weight in option_points.items():
+                if personality not in column:
+                    raise ValueError(f"Question {number}, {option!r}: unknown personality {personality!r}")
+                if not isinstance(weight, int) or isinstance(weight, bool) or weight < 0:
+                    raise ValueError(f"Question {number}, {option!r}: points must be non-negative integers")
+                row[column[personality]] += weight
+            points.append(tuple(row))
+        option_texts = tuple(options)
+        compiled.append(Question(
+            text=text,
+            options=option_texts,
+            option_index=MappingProxyType({option: i for i, option in enumerate(option_texts)}),
+            points=tuple(points),
+        ))
+    return Quiz(personalities=personalities, questions=tuple(compiled))
+
+
+QUIZ = compile_quiz()
+
+
+class ScoringEngine:
+    """Scores quiz answers with an (option x personality) weight matrix
+
+    Options of all questions are laid out along one axis, so a set of
+    answers is a row of option indices and its scores are the sum of the
+    matching weight rows. One answer set and a batch of millions go
+    through the same gather-and-sum; the winner is the first maximum,
+    matching `max(scores, key=scores.get)` over PERSONALITIES.
+    """
+
+    def __init__(self, quiz=QUIZ):
+        self.personalities = quiz.personalities
+        self.questions = quiz.questions
+        self.option_index = [question.option_index for question in quiz.questions]
+        offsets = []
+        rows = []
+        for question in quiz.questions:
+            offsets.append(len(rows))
+            rows.extend(question.points)
+        self.offsets = np.array(offsets, dtype=np.intp)
+        self.weights = np.array(rows, dtype=np.int16).reshape(len(rows), len(self.personalities))
+        self.weights.flags.writeable = False
+
+        # catch_up[q, j, l]: the most personality j can gain on l by answering question q
+        self.catch_up = np.stack([
+            (self.weights[start:end, :, None] - self.weights[start:end, None, :]).max(axis=0)
+            for start, end in zip(offsets, offsets[1:] + [len(rows)])
+        ]).astype(np.int32)
+        # separation[q, a, b]: how far apart a and b end up on question q, averaged over its options
+        self.separation = np.stack([
+            np.abs(self.weights[start:end, :, None] - self.weights[start:end, None, :]).mean(axis=0)
+            for start, end in zip(offsets, offsets[1:] + [len(rows)])
+        ])
+
+    @property
+    def num_questions(self):
+        return len(self.questions)
+
+    def encode_row(self, answers):
+        """Option texts (one per question) -> list of option indices within each question"""
+        if len(answers) != self.num_questions:
+            raise ValueError(f"Expected {self.num_questions} answers, got {len(answers)}")
+        return self.encode_row_for(range(self.num_questions), answers)
+
+    def encode(self, answers):
+        return np.array(self.encode_row(answers), dtype=np.intp)
+
+    def encode_batch(self, answer_sets):
+        """Many answer sets -> an (N, questions) array of option indices"""
+        return np.array([self.encode_row(answers) for answers in answer_sets],
+                        dtype=np.intp).reshape(-1, self.num_questions)
+
+    def scores(self, choices):
+        """Option indices of shape (questions,) or (N, questions) -> scores per personality"""
+        choices = np.asarray(choices, dtype=np.intp)
+        return self.weights[choices + self.offsets].sum(axis=-2, dtype=np.int32)
+
+    def classify(self, choices):
+        """Index of the winning personality for each answer set"""
+        return self.scores(choices).argmax(axis=-1)
+
+    def calculate(self, answers):
+        return self.personalities[int(self.classify(self.encode(answers)))]
+
+    def encode_row_for(self, asked, answers):
+        """Option indices for answers to just the questions in `asked`, in the same order"""
+        choices = []
+        for question, answer in zip(asked, answers):
+            choice = self.option_index[question].get(answer) if isinstance(answer, str) else None
+            if choice is None:
+                raise ValueError(f"Unknown answer {answer!r}")
+            choices.append(choice)
+        return choices
+
+    def partial_scores(self, asked, answers):
+        """Scores from the answers to just the questions in `asked`"""
+        scores = np.zeros(len(self.personalities), dtype=np.int32)
+        for question, choice in zip(asked, self.encode_row_for(asked, answers)):
+            scores += self.weights[self.offsets[question] + choice]
+        return scores
+
+    def leader(self, scores):
+        return int(np.argmax(scores))
+
+    def is_decided(self, scores, asked):
+        """True once no answers to the remaining questions can change the winner
+
+        For every rival, the most it can gain on the leader over the
+        unasked questions must fall short of the gap, or only tie it when
+        the leader comes first in PERSONALITIES (ties go to the first).
+        """
+        remaining = np.ones(self.num_questions, dtype=bool)
+        remaining[list(asked)] = False
+        leader = self.leader(scores)
+        gap = scores[leader] - np.asarray(scores)
+        reach = self.catch_up[remaining, :, leader].sum(axis=0)
+        for rival in range(len(self.personalities)):
+            if rival == leader:
+                continue
+            if reach[rival] > gap[rival] or (reach[rival] == gap[rival] and rival < leader):
+                return False
+        return True
+
+    def next_question(self, scores, asked):
+        """The unasked question that best separates the two current leaders, or None
+
+        Ties between questions go to the one listed first.
+        """
+        remaining = [q for q in range(self.num_questions) if q not in set(asked)]
+        if not remaining:
+            return None
+        # Stable sort: equal scores keep PERSONALITIES order, as the winner rule does
+        first, second = np.argsort(-np.asarray(scores), kind="stable")[:2]
+        separation = self.separation[remaining, first, second]
+        return remaining[int(np.argmax(separation))]
+
+    def calculate_batch(self, answer_sets):
+        """Personality names for a batch of answer sets"""
+        names = np.array(self.personalities)
+        return names[self.classify(self.encode_batch(answer_sets))]
+
+
+ENGINE = ScoringEngine()
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+
+CHUNK_SIZE = 1000
+
+# Format name -> (file extension, mime type)
+EXPORT_FORMATS = {
+    "json": (".json", "application/json"),
+    "ndjson": (".ndjson", "application/x-ndjson"),
+    "json.gz": (".json.gz", "application/gzip"),
+    "ndjson.gz": (".ndjson.gz", "application/gzip"),
+}
+
+
+def iter_json(todos, chunk_size=CHUNK_SIZE):
+    """Yield a compact JSON array of tasks as text chunks of `chunk_size` records"""
+    yield "["
+    batch = []
+    first = True
+    for todo in todos:
+        batch.append(json.dumps(todo, ensure_ascii=False, separators=(",", ":")))
+        if len(batch) >= chunk_size:
+            yield ("" if first else ",") + ",".join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ("" if first else ",") + ",".join(batch)
+    yield "]"
+
+
+def iter_ndjson(todos, chunk_size=CHUNK_SIZE):
+    """Yield one JSON object per line, `chunk_size` lines per chunk"""
+    batch = []
+    for todo in todos:
+        batch.append(json.dumps(todo, ensure_ascii=False, separators=(",", ":")))
+        if len(batch) >= chunk_size:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def iter_gzip(chunks):
+    """Gzip a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_export(todos, fmt, chunk_size=CHUNK_SIZE):
+    """Yield the export of `todos` in the given format as bytes chunks"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    base = fmt[:-3] if fmt.endswith(".gz") else fmt
+    chunks = iter_json(todos, chunk_size) if base == "json" else iter_ndjson(todos, chunk_size)
+    if fmt.endswith(".gz"):
+        return iter_gzip(chunks)
+    return (chunk.encode("utf-8") for chunk in chunks)
+
+
+def export_file(store, fmt, cache_dir):
+    """Return the path of an export of the store, writing it only if the data changed
+
+    Artifacts are named after the store's version number, so repeated
+    exports of unchanged tasks reuse the file on disk. Older versions of
+    the same format are removed when a new one is written.
+    """
+    ext = EXPORT_FORMATS[fmt][0]
+    db_name = os.path.splitext(os.path.basename(store.path))[0]
+    # Sanitising alone can map two lists ("team a", "team_a") to one name; the hash keeps them apart
+    source = f"{os.path.abspath(store.path)}\0{store.list_name}"
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:10]
+    stem = re.sub(r"\W", "_", f"{db_name}-{store.list_name}") + f"-{digest}"
+    path = os.path.join(cache_dir, f"{stem}_v{store.stored_version()}{ext}")
+    if os.path.exists(path):
+        return path
+
+    with store.snapshot() as (version, todos):
+        # The list may have changed since the version was checked
+        path = os.path.join(cache_dir, f"{stem}_v{version}{ext}")
+        if os.path.exists(path):
+            return path
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in iter_export(todos, fmt):
+                f.write(chunk)
+    os.replace(tmp_path, path)
+
+    stale = re.compile(re.escape(stem) + r"_v\d+" + re.escape(ext) + "$")
+    for name in os.listdir(cache_dir):
+        if stale.match(name) and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+    return path
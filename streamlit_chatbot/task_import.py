@@ -0,0 +1,273 @@
+import codecs
+import json
+from datetime import datetime
+
+from task_store import PRIORITIES, CATEGORIES, content_hash
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 500
+# Longest single task item (array item or NDJSON line) the readers will buffer
+MAX_ITEM_CHARS = 1024 * 1024
+
+# Stands in for a record that is not valid JSON, so the importer can count it and go on
+MALFORMED = object()
+
+_decoder = json.JSONDecoder()
+
+
+def iter_text_chunks(fp, chunk_size=CHUNK_SIZE):
+    """Yield decoded text from a binary or text file object, chunk by chunk"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def find_item_end(text, pos):
+    """Index of the "," or "]" ending the array item at `pos`, or -1 if it is not all in `text`
+
+    Only counts brackets outside strings, so it can step over an item that
+    is balanced but not valid JSON.
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(pos, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            if depth == 0:
+                return i
+            depth -= 1
+        elif char == "," and depth == 0:
+            return i
+    return -1
+
+
+def iter_json_array(chunks):
+    """Yield the items of a top-level JSON array without loading the whole document
+
+    An item that is not valid JSON is yielded as MALFORMED. If the end of a
+    bad item cannot be found within MAX_ITEM_CHARS, the reader has lost its
+    place in the array and raises ValueError.
+    """
+    buffer = ""
+    pos = 0
+    started = False
+    chunks = iter(chunks)
+    exhausted = False
+
+    def fill():
+        nonlocal buffer, pos, exhausted
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    while True:
+        # Skip whitespace and separators, pulling more text as needed
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or not fill():
+                break
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of file: the JSON array was never closed")
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise ValueError("Expected a JSON array of tasks")
+            started = True
+            pos += 1
+            continue
+        if char == "]":
+            return
+        if char == ",":
+            pos += 1
+            continue
+        # Decode one item; if it is cut off at the end of the buffer, read more and retry
+        while True:
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = find_item_end(buffer, pos)
+                if end != -1:
+                    # The whole item is here and still does not parse: skip just this one
+                    item = MALFORMED
+                    break
+                if len(buffer) - pos > MAX_ITEM_CHARS:
+                    raise ValueError(
+                        f"Malformed JSON in the task array: no end found for the item after "
+                        f"{MAX_ITEM_CHARS:,} characters, so the rest of the file was not imported"
+                    )
+                if exhausted or not fill():
+                    raise ValueError("Unexpected end of file inside a task in the JSON array")
+                continue
+            if end == len(buffer) and not exhausted and fill():
+                # A number at the very end of the buffer may continue in the next chunk
+                continue
+            break
+        pos = end
+        yield item
+
+
+def _parse_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return MALFORMED
+
+
+def iter_ndjson(chunks):
+    """Yield one JSON value per non-empty line, or MALFORMED for a line that does not parse
+
+    Only each new chunk is searched for line breaks. A line longer than
+    MAX_ITEM_CHARS is dropped as it is read and yielded as MALFORMED.
+    """
+    pending = []  # pieces of the line still being read
+    pending_chars = 0
+    too_long = False
+    for chunk in chunks:
+        lines = chunk.split("\n")
+        tail = lines.pop()
+        if lines:
+            if too_long:
+                yield MALFORMED
+            else:
+                pending.append(lines[0])
+                lines[0] = "".join(pending)
+            for i, line in enumerate(lines):
+                if (i or not too_long) and line.strip():
+                    yield _parse_line(line)
+            pending = []
+            pending_chars = 0
+            too_long = False
+        if not too_long:
+            pending.append(tail)
+            pending_chars += len(tail)
+            if pending_chars > MAX_ITEM_CHARS:
+                pending = []
+                too_long = True
+    if too_long:
+        yield MALFORMED
+    else:
+        line = "".join(pending)
+        if line.strip():
+            yield _parse_line(line)
+
+
+def iter_records(fp, chunk_size=CHUNK_SIZE):
+    """Stream records from a JSON array or NDJSON file, detected from the first character"""
+    chunks = iter_text_chunks(fp, chunk_size)
+    head = ""
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+    first = head.lstrip()[:1]
+
+    def replay():
+        yield head
+        yield from chunks
+
+    if first == "[":
+        return iter_json_array(replay())
+    return iter_ndjson(replay())
+
+
+def validate_record(raw, default_emoji="🐱"):
+    """Turn one imported item into task fields, or raise ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError("task must be an object")
+    task = raw.get("task")
+    if not isinstance(task, str) or not task.strip():
+        raise ValueError("task text is missing")
+    priority = raw.get("priority", PRIORITIES[1])
+    if priority not in PRIORITIES:
+        raise ValueError(f"unknown priority {priority!r}")
+    category = raw.get("category", CATEGORIES[0])
+    if category not in CATEGORIES:
+        raise ValueError(f"unknown category {category!r}")
+    completed = raw.get("completed", raw.get("done", False))
+    if not isinstance(completed, bool):
+        raise ValueError("completed must be true or false")
+    created_at = raw.get("created_at")
+    if created_at is not None:
+        datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
+    completed_at = raw.get("completed_at")
+    if completed_at is not None:
+        datetime.strptime(completed_at, "%Y-%m-%d %H:%M:%S")
+    cat_emoji = raw.get("cat_emoji")
+    if not isinstance(cat_emoji, str) or not cat_emoji:
+        cat_emoji = default_emoji() if callable(default_emoji) else default_emoji
+    # Ids in the file are ignored; the store assigns fresh ones
+    return {
+        "task": task.strip(),
+        "priority": priority,
+        "category": category,
+        "completed": completed,
+        "created_at": created_at,
+        "cat_emoji": cat_emoji,
+        "completed_at": completed_at,
+    }
+
+
+def import_tasks(store, fp, batch_size=BATCH_SIZE, default_emoji="🐱", on_progress=None):
+    """Stream tasks from a JSON array or NDJSON file into the store in batches
+
+    Invalid records are skipped, and records whose content already exists
+    in the store (or earlier in the file) are counted as duplicates, so
+    importing the same file twice adds nothing. `on_progress` is called
+    with the running counts after each batch.
+    """
+    report = {"added": 0, "duplicates": 0, "invalid": 0}
+
+    def flush(batch):
+        # Drop records already stored; only this batch's hashes are held in memory
+        existing = store.existing_hashes(batch)
+        fresh = [todo for key, todo in batch.items() if key not in existing]
+        store.add_many(fresh)
+        report["added"] += len(fresh)
+        report["duplicates"] += len(batch) - len(fresh)
+        if on_progress:
+            on_progress(report)
+
+    batch = {}
+    for raw in iter_records(fp):
+        if raw is MALFORMED:
+            report["invalid"] += 1
+            continue
+        try:
+            todo = validate_record(raw, default_emoji)
+        except (ValueError, TypeError):
+            report["invalid"] += 1
+            continue
+        key = content_hash(todo["task"], todo["priority"], todo["category"])
+        if key in batch:
+            report["duplicates"] += 1
+            continue
+        batch[key] = todo
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = {}
+    if batch:
+        flush(batch)
+    return report
@@ -0,0 +1,189 @@
+import bisect
+import heapq
+
+# Batches up to this size move order keys one by one; larger ones rebuild the order list
+SMALL_BATCH = 128
+
+
+class TaskIndex:
+    """Secondary indexes over tasks: category -> ids, priority -> ids, completion sets
+    and a sorted display order for paging"""
+
+    def __init__(self, sort_key):
+        self.sort_key = sort_key
+        self.by_category = {}
+        self.by_priority = {}
+        self.completed = set()
+        self.open = set()
+        # id -> order key, and all order keys sorted; keys end with the id so they are unique
+        self.keys = {}
+        self.order = []
+
+    @staticmethod
+    def _add_to(index, key, task_id):
+        index.setdefault(key, set()).add(task_id)
+
+    @staticmethod
+    def _remove_from(index, key, task_id):
+        ids = index.get(key)
+        if ids is None:
+            return
+        ids.discard(task_id)
+        if not ids:
+            # Drop empty keys so the filter dropdowns only list values in use
+            del index[key]
+
+    def _add_buckets(self, todo):
+        task_id = todo["id"]
+        self._add_to(self.by_category, todo["category"], task_id)
+        self._add_to(self.by_priority, todo["priority"], task_id)
+        (self.completed if todo["completed"] else self.open).add(task_id)
+
+    def add(self, todo):
+        self._add_buckets(todo)
+        self._insert_order(todo)
+
+    def _insert_order(self, todo):
+        key = (*self.sort_key(todo), todo["id"])
+        self.keys[todo["id"]] = key
+        bisect.insort(self.order, key)
+
+    def _remove_order(self, task_id):
+        key = self.keys.pop(task_id, None)
+        if key is None:
+            return
+        pos = bisect.bisect_left(self.order, key)
+        if pos < len(self.order) and self.order[pos] == key:
+            del self.order[pos]
+
+    def _remove_buckets(self, todo):
+        task_id = todo["id"]
+        self._remove_from(self.by_category, todo["category"], task_id)
+        self._remove_from(self.by_priority, todo["priority"], task_id)
+        self.completed.discard(task_id)
+        self.open.discard(task_id)
+
+    def remove(self, todo):
+        self._remove_buckets(todo)
+        self._remove_order(todo["id"])
+
+    def _update_buckets(self, old, new):
+        task_id = new["id"]
+        if old["category"] != new["category"]:
+            self._remove_from(self.by_category, old["category"], task_id)
+            self._add_to(self.by_category, new["category"], task_id)
+        if old["priority"] != new["priority"]:
+            self._remove_from(self.by_priority, old["priority"], task_id)
+            self._add_to(self.by_priority, new["priority"], task_id)
+        if old["completed"] != new["completed"]:
+            (self.completed if old["completed"] else self.open).discard(task_id)
+            (self.completed if new["completed"] else self.open).add(task_id)
+
+    def update(self, old, new):
+        """Move a task between index buckets after an edit"""
+        self._update_buckets(old, new)
+        if self.sort_key(old) != self.sort_key(new):
+            self._remove_order(new["id"])
+            self._insert_order(new)
+
+    # Batch versions: small batches bisect per task, large ones rewrite the display order once
+    def _drop_order_keys(self, task_ids):
+        if len(task_ids) <= SMALL_BATCH:
+            for task_id in task_ids:
+                self._remove_order(task_id)
+            return
+        for task_id in task_ids:
+            self.keys.pop(task_id, None)
+        self.order = [key for key in self.order if key[-1] not in task_ids]
+
+    def _add_order_keys(self, todos):
+        if len(todos) <= SMALL_BATCH:
+            for todo in todos:
+                self._insert_order(todo)
+            return
+        for todo in todos:
+            key = (*self.sort_key(todo), todo["id"])
+            self.keys[todo["id"]] = key
+            self.order.append(key)
+        self.order.sort()
+
+    def add_many(self, todos):
+        for todo in todos:
+            self._add_buckets(todo)
+        self._add_order_keys(todos)
+
+    def remove_many(self, todos):
+        for todo in todos:
+            self._remove_buckets(todo)
+        self._drop_order_keys({todo["id"] for todo in todos})
+
+    def update_many(self, changes):
+        """update() for a batch of (old, new) pairs"""
+        moved = []
+        for old, new in changes:
+            self._update_buckets(old, new)
+            if self.sort_key(old) != self.sort_key(new):
+                moved.append(new)
+        if moved:
+            self._drop_order_keys({todo["id"] for todo in moved})
+            self._add_order_keys(moved)
+
+    def clear(self):
+        self.by_category.clear()
+        self.by_priority.clear()
+        self.completed.clear()
+        self.open.clear()
+        self.keys.clear()
+        self.order.clear()
+
+    def categories(self):
+        """Categories that currently have at least one task"""
+        return list(self.by_category)
+
+    def query(self, show_completed=True, category=None, priority=None):
+        """Return the set of matching ids by intersecting index buckets
+
+        Returns None when no filter is active, meaning "every task".
+        """
+        candidates = []
+        if not show_completed:
+            candidates.append(self.open)
+        if category is not None:
+            candidates.append(self.by_category.get(category, set()))
+        if priority is not None:
+            candidates.append(self.by_priority.get(priority, set()))
+        if not candidates:
+            return None
+        # Iterate the smallest bucket and probe the others, so cost follows the result size
+        candidates.sort(key=len)
+        smallest, others = candidates[0], candidates[1:]
+        return smallest.intersection(*others)
+
+    def page(self, ids=None, after=None, limit=20, scores=None):
+        """Return up to `limit` ids in display order after the `after` cursor
+
+        `ids` is a filter result from query(), or None for every task. With
+        `scores` (id -> search score), only those ids are paged, best score
+        first and then in display order. The returned cursor is the order key
+        of the last id on the page, or None when there are no more tasks.
+        """
+        if scores is not None:
+            candidates = ((-score, *self.keys[task_id]) for task_id, score in scores.items()
+                          if ids is None or task_id in ids)
+            if after is not None:
+                candidates = (key for key in candidates if key > after)
+            keys = heapq.nsmallest(limit + 1, candidates)
+        elif ids is None:
+            # Walk the sorted order directly: O(log n + limit)
+            start = 0 if after is None else bisect.bisect_right(self.order, after)
+            keys = self.order[start:start + limit + 1]
+        else:
+            # Select the smallest keys of the filter result: O(r log limit)
+            candidates = (self.keys[task_id] for task_id in ids)
+            if after is not None:
+                candidates = (key for key in candidates if key > after)
+            keys = heapq.nsmallest(limit + 1, candidates)
+        has_more = len(keys) > limit
+        keys = keys[:limit]
+        next_cursor = keys[-1] if has_more and keys else None
+        return [key[-1] for key in keys], next_cursor
@@ -0,0 +1,135 @@
+import threading
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_EPOCH = datetime(1970, 1, 1)
+
+
+class Codebook:
+    """Two-way mapping between repeated strings and small integer codes"""
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        self._lock = threading.Lock()
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+
+def encode_time(value):
+    """'YYYY-MM-DD HH:MM:SS' -> whole seconds since 1970, read as a naive timestamp"""
+    if value is None:
+        return None
+    return int((datetime.fromisoformat(value) - _EPOCH).total_seconds())
+
+
+def decode_time(seconds):
+    if seconds is None:
+        return None
+    return (_EPOCH + timedelta(seconds=seconds)).strftime(TIMESTAMP_FORMAT)
+
+
+# Shared by every store in the process, so each distinct string is held once
+PRIORITY_CODES = Codebook()
+CATEGORY_CODES = Codebook()
+EMOJI_CODES = Codebook()
+
+FIELDS = ("id", "task", "priority", "category", "completed", "created_at", "cat_emoji", "completed_at")
+
+
+class TaskRecord:
+    """Compact in-memory task: enum codes for repeated strings, epoch ints for times
+
+    Reads like the task dict it replaces (`todo["priority"]`, `todo.get(...)`),
+    decoding values on access; use `as_dict()` for a plain dict.
+    """
+
+    __slots__ = ("id", "task", "priority_code", "category_code", "completed",
+                 "created_ts", "emoji_code", "completed_ts", "rev")
+
+    def __init__(self, id, task, priority, category, completed, created_at, cat_emoji,
+                 completed_at=None, rev=0):
+        self.id = id
+        self.task = task
+        self.priority_code = PRIORITY_CODES.encode(priority)
+        self.category_code = CATEGORY_CODES.encode(category)
+        self.completed = bool(completed)
+        self.created_ts = encode_time(created_at)
+        self.emoji_code = EMOJI_CODES.encode(cat_emoji)
+        self.completed_ts = encode_time(completed_at)
+        # Bumped on every write; callers pass it back for optimistic concurrency
+        self.rev = rev
+
+    def __getitem__(self, key):
+        if key == "id":
+            return self.id
+        if key == "task":
+            return self.task
+        if key == "priority":
+            return PRIORITY_CODES.decode(self.priority_code)
+        if key == "category":
+            return CATEGORY_CODES.decode(self.category_code)
+        if key == "completed":
+            return self.completed
+        if key == "created_at":
+            return decode_time(self.created_ts)
+        if key == "cat_emoji":
+            return EMOJI_CODES.decode(self.emoji_code)
+        if key == "completed_at":
+            return decode_time(self.completed_ts)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return FIELDS
+
+    def as_dict(self):
+        return {name: self[name] for name in FIELDS}
+
+    def copy(self):
+        clone = TaskRecord.__new__(TaskRecord)
+        for name in TaskRecord.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def set(self, fields):
+        """Apply decoded field values, e.g. from TaskStore.update()"""
+        for name, value in fields.items():
+            if name == "task":
+                self.task = value
+            elif name == "priority":
+                self.priority_code = PRIORITY_CODES.encode(value)
+            elif name == "category":
+                self.category_code = CATEGORY_CODES.encode(value)
+            elif name == "completed":
+                self.completed = bool(value)
+            elif name == "created_at":
+                self.created_ts = encode_time(value)
+            elif name == "cat_emoji":
+                self.emoji_code = EMOJI_CODES.encode(value)
+            elif name == "completed_at":
+                self.completed_ts = encode_time(value)
+            else:
+                raise KeyError(name)
+
+    def __repr__(self):
+        return f"TaskRecord({self.as_dict()!r})"
@@ -0,0 +1,113 @@
+import bisect
+import math
+import re
+
+# A query of one word shorter than this is not searched at all: as a prefix it would start
+# a large part of the vocabulary. Next to other words a short word narrows their matches.
+MIN_PREFIX = 2
+# A word that only starts with the query token counts this much of a whole-word match
+PREFIX_WEIGHT = 0.5
+
+_WORDS = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _WORDS.findall(text.casefold())
+
+
+def is_searchable(query):
+    """False for a query too short to search (see MIN_PREFIX) or with no words"""
+    tokens = set(tokenize(query))
+    return bool(tokens) and (len(tokens) > 1 or len(next(iter(tokens))) >= MIN_PREFIX)
+
+
+class TaskSearchIndex:
+    """Inverted index over task text: term -> ids, plus a sorted vocabulary for prefix lookups
+
+    Updated incrementally with the other task indexes. match() treats every
+    query word as a prefix, so results follow as-you-type queries, and
+    scores each task by how rare the words it matched are.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []  # every term with postings, sorted
+        self.terms = {}  # id -> the task's distinct terms, to undo on remove
+
+    def add(self, todo):
+        terms = tuple(dict.fromkeys(tokenize(todo["task"])))  # Tuples are far smaller than sets
+        self.terms[todo["id"]] = terms
+        for term in terms:
+            ids = self.postings.get(term)
+            if ids is None:
+                ids = self.postings[term] = set()
+                bisect.insort(self.vocabulary, term)
+            ids.add(todo["id"])
+
+    def remove(self, todo):
+        task_id = todo["id"]
+        for term in self.terms.pop(task_id, ()):
+            ids = self.postings[term]
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+
+    def update(self, old, new):
+        if old["task"] != new["task"]:
+            self.remove(old)
+            self.add(new)
+
+    def clear(self):
+        self.postings.clear()
+        self.vocabulary.clear()
+        self.terms.clear()
+
+    def expand(self, token):
+        """Vocabulary terms the query token matches: itself and the words it starts"""
+        start = bisect.bisect_left(self.vocabulary, token)
+        end = bisect.bisect_left(self.vocabulary, token + "\U0010ffff", start)
+        return self.vocabulary[start:end]
+
+    def _weight(self, term, token):
+        idf = math.log(1 + len(self.terms) / len(self.postings[term]))
+        return idf if term == token else idf * PREFIX_WEIGHT
+
+    def match(self, query, ids=None):
+        """Scores of the tasks matching every word of `query`, as {id: score}
+
+        `ids` optionally restricts the result to a filter from TaskIndex.query().
+        Returns None, meaning "no search", for a query that is_searchable()
+        rejects: one with no words, or a single word shorter than MIN_PREFIX.
+        """
+        if not is_searchable(query):
+            return None
+        tokens = list(dict.fromkeys(tokenize(query)))
+        expansions = {token: self.expand(token) for token in tokens}
+        sizes = {token: sum(len(self.postings[term]) for term in terms) for token, terms in expansions.items()}
+        # Narrow down with set operations, rarest word first, before scoring anything
+        candidates = ids
+        for token in sorted(tokens, key=sizes.get):
+            terms = expansions[token]
+            if candidates is not None and len(candidates) * 8 < sizes[token]:
+                # Far fewer candidates than postings: check their own terms instead
+                terms = set(terms)
+                candidates = {task_id for task_id in candidates if not terms.isdisjoint(self.terms[task_id])}
+            else:
+                matched = set().union(*(self.postings[term] for term in terms))
+                candidates = matched if candidates is None else matched & candidates
+            if not candidates:
+                return {}
+        # Each task scores, per query word, the best weight among the terms it matched
+        scores = dict.fromkeys(candidates, 0.0)
+        for token in tokens:
+            unscored = set(candidates)
+            weighted = sorted(((self._weight(term, token), term) for term in expansions[token]), reverse=True)
+            for weight, term in weighted:
+                hits = self.postings[term] & unscored
+                for task_id in hits:
+                    scores[task_id] += weight
+                unscored -= hits
+                if not unscored:
+                    break
+        return scores
@@ -0,0 +1,73 @@
+from collections import Counter
+
+
+class TaskStats:
+    """Running task counters, updated in O(1) on every store mutation"""
+
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.by_category = Counter()
+        self.by_priority = Counter()
+        # Completion day ("YYYY-MM-DD") -> number of tasks completed that day
+        self.completions_by_day = Counter()
+
+    @staticmethod
+    def _day(todo):
+        completed_at = todo.get("completed_at")
+        return completed_at[:10] if completed_at else None
+
+    @staticmethod
+    def _decrement(counter, key):
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    def add(self, todo):
+        self.total += 1
+        self.by_category[todo["category"]] += 1
+        self.by_priority[todo["priority"]] += 1
+        if todo["completed"]:
+            self.completed += 1
+            day = self._day(todo)
+            if day:
+                self.completions_by_day[day] += 1
+
+    def remove(self, todo):
+        self.total -= 1
+        self._decrement(self.by_category, todo["category"])
+        self._decrement(self.by_priority, todo["priority"])
+        if todo["completed"]:
+            self.completed -= 1
+            day = self._day(todo)
+            if day:
+                self._decrement(self.completions_by_day, day)
+
+    def update(self, old, new):
+        self.remove(old)
+        self.add(new)
+
+    def clear(self):
+        self.total = 0
+        self.completed = 0
+        self.by_category.clear()
+        self.by_priority.clear()
+        self.completions_by_day.clear()
+
+    def copy(self):
+        clone = TaskStats()
+        clone.total = self.total
+        clone.completed = self.completed
+        clone.by_category = self.by_category.copy()
+        clone.by_priority = self.by_priority.copy()
+        clone.completions_by_day = self.completions_by_day.copy()
+        return clone
+
+    @property
+    def remaining(self):
+        return self.total - self.completed
+
+    @property
+    def completion_rate(self):
+        """Percentage of tasks completed"""
+        return (self.completed / self.total) * 100 if self.total > 0 else 0
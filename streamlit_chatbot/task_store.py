@@ -0,0 +1,639 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from task_index import TaskIndex
+from task_records import TaskRecord, PRIORITY_CODES, CATEGORY_CODES
+from task_search import TaskSearchIndex
+from task_stats import TaskStats
+
+# Allowed values for the task form
+PRIORITIES = ["🔴 High", "🟡 Medium", "🟢 Low"]
+CATEGORIES = ["🏠 Personal", "💼 Work", "🛒 Shopping", "🎯 Goals", "🐱 Cat Care"]
+
+# Seed the codebooks so priority codes double as sort ranks
+for _priority in PRIORITIES:
+    PRIORITY_CODES.encode(_priority)
+for _category in CATEGORIES:
+    CATEGORY_CODES.encode(_category)
+
+DEFAULT_LIST = "default"
+
+# How many list versions of change log to keep for other connections to catch up from
+CHANGE_LOG_LIMIT = 10_000
+
+TASK_FIELDS = ("task", "priority", "category", "completed", "created_at", "cat_emoji", "completed_at")
+
+SELECT_TASKS = (
+    "SELECT id, task, priority, category, completed, created_at, cat_emoji, completed_at, rev "
+    "FROM tasks"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    category TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    cat_emoji TEXT NOT NULL,
+    completed_at TEXT,
+    content_hash TEXT,
+    list_name TEXT NOT NULL DEFAULT 'default',
+    rev INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lists (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    list_name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    task_id INTEGER,
+    op TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_list_hash ON tasks (list_name, content_hash);
+CREATE INDEX IF NOT EXISTS idx_changes_list_version ON changes (list_name, version);
+"""
+
+
+class ConflictError(Exception):
+    """The task or list changed since the caller last read it"""
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def content_hash(task, priority, category):
+    """Fingerprint of what a task says, used to spot duplicates on import"""
+    text = "\x1f".join((" ".join(task.split()).casefold(), priority, category))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def display_order(todo):
+    """Sort tasks by priority (high first), then oldest first"""
+    return (todo.priority_code, todo.created_ts)
+
+
+def _connect(path):
+    # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class TaskStore:
+    """SQLite-backed task list with stable ids, filter and search indexes and running stats
+
+    Tasks are mirrored in memory as compact TaskRecord objects keyed by id.
+    One store is meant to be shared by every session in the process: reads
+    take a short in-memory lock, and writes are serialised through one
+    connection so readers never wait on disk. Each list has a version that
+    every write bumps and records in a change log, so other connections to
+    the same file (other processes, scripts) catch up by replaying only
+    the delta. Writes can carry the task's `rev` or the list's version and
+    raise ConflictError if someone else got there first.
+    """
+
+    def __init__(self, path, list_name=DEFAULT_LIST, migrate_from=None):
+        self.path = path
+        self.list_name = list_name
+        self._conn = _connect(path)
+        self._conn.executescript(SCHEMA)
+        # A second connection just for peeking at the list version without the write lock
+        self._peek_conn = _connect(path)
+        self._peek_lock = threading.Lock()
+        # _write_lock serialises use of the main connection; _lock guards the in-memory mirror
+        self._write_lock = threading.RLock()
+        self._lock = threading.RLock()
+        self._tasks = {}
+        self.index = TaskIndex(sort_key=display_order)
+        self.text_index = TaskSearchIndex()
+        self.stats = TaskStats()
+        self.version = 0
+        self._loaded = False
+        with self._transaction():
+            self._conn.execute(
+                "INSERT OR IGNORE INTO lists (name, version) VALUES (?, 0)", (list_name,)
+            )
+        if migrate_from and list_name == DEFAULT_LIST:
+            self._migrate_json(migrate_from)
+        with self._write_lock:
+            self._reload()
+
+    @contextmanager
+    def _transaction(self):
+        """Serialised write transaction that first replays other connections' changes"""
+        with self._write_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._catch_up()
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _read_version(self, conn=None):
+        row = (conn or self._conn).execute(
+            "SELECT version FROM lists WHERE name = ?", (self.list_name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _log_changes(self, changes):
+        """Bump the list version and record which tasks changed; call inside _transaction()"""
+        self._conn.execute(
+            "UPDATE lists SET version = version + 1 WHERE name = ?", (self.list_name,)
+        )
+        version = self._read_version()
+        self._conn.executemany(
+            "INSERT INTO changes (list_name, version, task_id, op) VALUES (?, ?, ?, ?)",
+            [(self.list_name, version, task_id, op) for task_id, op in changes],
+        )
+        self._conn.execute(
+            "DELETE FROM changes WHERE list_name = ? AND version <= ?",
+            (self.list_name, version - CHANGE_LOG_LIMIT),
+        )
+        self.version = version
+
+    def _reload(self):
+        """Rebuild the mirror from the table; call with the write lock held"""
+        version = self._read_version()
+        cursor = self._conn.execute(SELECT_TASKS + " WHERE list_name = ? ORDER BY id", (self.list_name,))
+        tasks = {}
+        index = TaskIndex(sort_key=display_order)
+        text_index = TaskSearchIndex()
+        stats = TaskStats()
+        for row in cursor:
+            todo = TaskRecord(*row)
+            tasks[todo.id] = todo
+            index.add(todo)
+            text_index.add(todo)
+            stats.add(todo)
+        with self._lock:
+            self._tasks, self.index, self.text_index, self.stats = tasks, index, text_index, stats
+            self.version = version
+            self._loaded = True
+
+    def _catch_up(self):
+        """Apply changes other connections committed since this mirror's version"""
+        if not self._loaded:
+            return
+        version = self._read_version()
+        if version == self.version:
+            return
+        log = self._conn.execute(
+            "SELECT version, task_id, op FROM changes WHERE list_name = ? AND version > ? ORDER BY seq",
+            (self.list_name, self.version),
+        ).fetchall()
+        if not log or log[0][0] != self.version + 1:
+            # The log no longer reaches back to our version; start over from the table
+            self._reload()
+            return
+        cleared = False
+        touched = set()
+        for _, task_id, op in log:
+            if op == "clear":
+                cleared = True
+                touched.clear()
+            else:
+                touched.add(task_id)
+        rows = {}
+        touched = list(touched)
+        for start in range(0, len(touched), 500):
+            chunk = touched[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            for row in self._conn.execute(SELECT_TASKS + f" WHERE id IN ({placeholders})", chunk):
+                rows[row[0]] = row
+        with self._lock:
+            if cleared:
+                self._tasks.clear()
+                self.index.clear()
+                self.text_index.clear()
+                self.stats.clear()
+            removed, added = [], []
+            for task_id in touched:
+                old = self._tasks.pop(task_id, None)
+                if old is not None:
+                    self.text_index.remove(old)
+                    self.stats.remove(old)
+                    removed.append(old)
+                if task_id in rows:
+                    todo = TaskRecord(*rows[task_id])
+                    self._tasks[task_id] = todo
+                    self.text_index.add(todo)
+                    self.stats.add(todo)
+                    added.append(todo)
+            self.index.remove_many(removed)
+            self.index.add_many(added)
+            self.version = version
+
+    def refresh(self):
+        """Pull in changes made through other connections; return True if there were any"""
+        with self._peek_lock:
+            latest = self._read_version(self._peek_conn)
+        if latest == self.version:
+            return False
+        with self._write_lock:
+            before = self.version
+            self._catch_up()
+            return self.version != before
+
+    @staticmethod
+    def _row_to_task(row):
+        return {
+            "id": row[0],
+            "task": row[1],
+            "priority": row[2],
+            "category": row[3],
+            "completed": bool(row[4]),
+            "created_at": row[5],
+            "cat_emoji": row[6],
+            "completed_at": row[7],
+        }
+
+    def _migrate_json(self, json_path):
+        """Import the legacy tasks.json list once, then remember it was done
+
+        Records are checked like imported ones; those that fail are skipped
+        and counted under the meta key 'migrated_tasks_json_skipped'.
+        """
+        done = self._conn.execute(
+            "SELECT 1 FROM meta WHERE key = 'migrated_tasks_json'"
+        ).fetchone()
+        if done or not os.path.exists(json_path):
+            return
+        # Imported here: task_import builds on this module
+        from task_import import validate_record
+
+        with open(json_path, encoding="utf-8") as f:
+            try:
+                legacy = json.load(f)
+            except json.JSONDecodeError:
+                legacy = []
+        if not isinstance(legacy, list):
+            legacy = []
+        now = _now()
+        with self._transaction():
+            # Another process may have migrated while we were reading the file
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_tasks_json'").fetchone():
+                return
+            added = []
+            skipped = 0
+            for item in legacy:
+                try:
+                    todo = validate_record(item)
+                except (ValueError, TypeError):
+                    # Stored as is, a bad record would fail every later load of the list
+                    skipped += 1
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT INTO tasks (task, priority, category, completed, created_at, cat_emoji, "
+                    "completed_at, content_hash, list_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        todo["task"],
+                        todo["priority"],
+                        todo["category"],
+                        int(todo["completed"]),
+                        todo["created_at"] or now,
+                        todo["cat_emoji"],
+                        todo["completed_at"],
+                        content_hash(todo["task"], todo["priority"], todo["category"]),
+                        self.list_name,
+                    ),
+                )
+                added.append((cursor.lastrowid, "upsert"))
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('migrated_tasks_json', ?)", (now,)
+            )
+            if skipped:
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('migrated_tasks_json_skipped', ?)", (str(skipped),)
+                )
+            if added:
+                self._log_changes(added)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, task_id):
+        return task_id in self._tasks
+
+    def all(self):
+        """Return all tasks in creation order"""
+        with self._lock:
+            return list(self._tasks.values())
+
+    def get(self, task_id):
+        return self._tasks.get(task_id)
+
+    def page(self, show_completed=True, category=None, priority=None, after=None, limit=20, search=None):
+        """Return one page of filtered tasks, its cursor and the match count
+
+        Tasks come in display order, or best match first when `search` text
+        is given (every word must match the start of a word in the task).
+        """
+        with self._lock:
+            ids = self.index.query(show_completed, category, priority)
+            scores = self.text_index.match(search, ids) if search else None
+            page_ids, next_cursor = self.index.page(ids, after=after, limit=limit, scores=scores)
+            if scores is not None:
+                total = len(scores)
+            else:
+                total = len(self._tasks) if ids is None else len(ids)
+            return [self._tasks[task_id] for task_id in page_ids], next_cursor, total
+
+    def matching_ids(self, show_completed=True, category=None, priority=None, search=None):
+        """Ids of every task page() would list for these filters"""
+        with self._lock:
+            ids = self.index.query(show_completed, category, priority)
+            scores = self.text_index.match(search, ids) if search else None
+            if scores is not None:
+                return set(scores)
+            return set(self._tasks) if ids is None else set(ids)
+
+    def completed_ids(self):
+        with self._lock:
+            return set(self.index.completed)
+
+    def categories(self):
+        with self._lock:
+            return self.index.categories()
+
+    def get_stats(self):
+        """A consistent copy of the running counters"""
+        with self._lock:
+            return self.stats.copy()
+
+    def add(self, task, priority, category, cat_emoji, completed=False, created_at=None,
+            completed_at=None):
+        """Insert a task and return it with its new id"""
+        todo = {
+            "task": task,
+            "priority": priority,
+            "category": category,
+            "completed": completed,
+            "created_at": created_at,
+            "cat_emoji": cat_emoji,
+            "completed_at": completed_at,
+        }
+        return self.add_many([todo])[0]
+
+    def add_many(self, todos):
+        """Insert a batch of task dicts in one transaction and return them with their ids"""
+        with self._transaction():
+            added = [self._insert(dict(todo)) for todo in todos]
+            if added:
+                self._log_changes([(todo.id, "upsert") for todo in added])
+            with self._lock:
+                for todo in added:
+                    self._tasks[todo.id] = todo
+                    self.index.add(todo)
+                    self.text_index.add(todo)
+                    self.stats.add(todo)
+        return added
+
+    def _insert(self, todo):
+        if todo.get("created_at") is None:
+            todo["created_at"] = _now()
+        todo["completed"] = bool(todo.get("completed", False))
+        if todo["completed"] and todo.get("completed_at") is None:
+            todo["completed_at"] = todo["created_at"]
+        elif not todo["completed"]:
+            todo["completed_at"] = None
+        cursor = self._conn.execute(
+            "INSERT INTO tasks (task, priority, category, completed, created_at, cat_emoji, "
+            "completed_at, content_hash, list_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                todo["task"],
+                todo["priority"],
+                todo["category"],
+                int(todo["completed"]),
+                todo["created_at"],
+                todo["cat_emoji"],
+                todo["completed_at"],
+                content_hash(todo["task"], todo["priority"], todo["category"]),
+                self.list_name,
+            ),
+        )
+        return TaskRecord(cursor.lastrowid, *(todo[name] for name in TASK_FIELDS))
+
+    def stored_version(self):
+        """The list's version on disk, which may be ahead of this store's mirror"""
+        with self._peek_lock:
+            return self._read_version(self._peek_conn)
+
+    @contextmanager
+    def snapshot(self, chunk_size=1000):
+        """Context giving the stored version and an iterator over all tasks read straight from disk
+
+        Rows are fetched `chunk_size` at a time inside one read transaction,
+        so the tasks match the returned version and are never all in memory.
+        The transaction and its connection end when the block exits, whether
+        or not the tasks were read.
+        """
+        reader = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        try:
+            reader.execute("BEGIN")
+            version = self._read_version(reader)
+
+            def rows():
+                cursor = reader.execute(
+                    SELECT_TASKS + " WHERE list_name = ? ORDER BY id", (self.list_name,)
+                )
+                while True:
+                    batch = cursor.fetchmany(chunk_size)
+                    if not batch:
+                        break
+                    for row in batch:
+                        yield self._row_to_task(row)
+
+            yield version, rows()
+        finally:
+            if reader.in_transaction:
+                reader.execute("ROLLBACK")
+            reader.close()
+
+    def existing_hashes(self, hashes):
+        """Return which of the given content hashes already belong to tasks in this list"""
+        hashes = list(hashes)
+        found = set()
+        with self._write_lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                found.update(row[0] for row in self._conn.execute(
+                    f"SELECT content_hash FROM tasks WHERE list_name = ? "
+                    f"AND content_hash IN ({placeholders})",
+                    (self.list_name, *chunk),
+                ))
+        return found
+
+    def _current(self, task_id, expected_rev):
+        """The task as of now, checked against the revision the caller saw"""
+        todo = self._tasks.get(task_id)
+        if expected_rev is not None and (todo is None or todo.rev != expected_rev):
+            raise ConflictError(f"Task {task_id} was changed elsewhere")
+        if todo is None:
+            raise KeyError(task_id)
+        return todo
+
+    def update(self, task_id, expected_rev=None, **fields):
+        """Change some fields of one task by id
+
+        Pass the `rev` the caller last saw as `expected_rev` to fail with
+        ConflictError instead of overwriting someone else's change.
+        """
+        unknown = set(fields) - set(TASK_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown task fields: {', '.join(sorted(unknown))}")
+        with self._transaction():
+            todo = self._current(task_id, expected_rev)
+            if not fields:
+                return todo
+            if "completed" in fields and "completed_at" not in fields \
+                    and bool(fields["completed"]) != todo["completed"]:
+                fields["completed_at"] = _now() if fields["completed"] else None
+            columns = [f"{name} = ?" for name in fields]
+            values = [int(v) if name == "completed" else v for name, v in fields.items()]
+            if {"task", "priority", "category"} & set(fields):
+                merged = {**todo, **fields}
+                columns.append("content_hash = ?")
+                values.append(content_hash(merged["task"], merged["priority"], merged["category"]))
+            cursor = self._conn.execute(
+                f"UPDATE tasks SET {', '.join(columns)}, rev = rev + 1 WHERE id = ? AND rev = ?",
+                (*values, task_id, todo.rev),
+            )
+            if cursor.rowcount != 1:
+                raise ConflictError(f"Task {task_id} was changed elsewhere")
+            self._log_changes([(task_id, "upsert")])
+            with self._lock:
+                old = todo.copy()
+                todo.set(fields)
+                todo.rev += 1
+                self.index.update(old, todo)
+                self.text_index.update(old, todo)
+                self.stats.update(old, todo)
+        return todo
+
+    def bulk_update(self, task_ids, **fields):
+        """Give many tasks the same field values in one transaction; return the tasks changed
+
+        Tasks that no longer exist or already have those values are skipped.
+        The whole batch is one list version and one change-log entry set.
+        """
+        unknown = set(fields) - set(TASK_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown task fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return []
+        now = _now()
+        with self._transaction():
+            changes = []
+            for task_id in dict.fromkeys(task_ids):
+                todo = self._tasks.get(task_id)
+                if todo is None or all(todo[name] == value for name, value in fields.items()):
+                    continue
+                row = dict(fields)
+                if "completed" in fields and "completed_at" not in fields:
+                    if bool(fields["completed"]) != todo["completed"]:
+                        row["completed_at"] = now if fields["completed"] else None
+                    else:
+                        row["completed_at"] = todo["completed_at"]
+                changes.append((todo, row))
+            if not changes:
+                return []
+            names = list(changes[0][1])
+            columns = [f"{name} = ?" for name in names]
+            rehash = bool({"task", "priority", "category"} & set(fields))
+            if rehash:
+                columns.append("content_hash = ?")
+            params = []
+            for todo, row in changes:
+                values = [int(row[name]) if name == "completed" else row[name] for name in names]
+                if rehash:
+                    merged = {**todo, **row}
+                    values.append(content_hash(merged["task"], merged["priority"], merged["category"]))
+                params.append((*values, todo.id))
+            self._conn.executemany(
+                f"UPDATE tasks SET {', '.join(columns)}, rev = rev + 1 WHERE id = ?", params
+            )
+            self._log_changes([(todo.id, "upsert") for todo, _ in changes])
+            with self._lock:
+                pairs = []
+                for todo, row in changes:
+                    old = todo.copy()
+                    todo.set(row)
+                    todo.rev += 1
+                    self.text_index.update(old, todo)
+                    self.stats.update(old, todo)
+                    pairs.append((old, todo))
+                self.index.update_many(pairs)
+        return [todo for todo, _ in changes]
+
+    def set_completed(self, task_id, completed, expected_rev=None):
+        return self.update(task_id, expected_rev=expected_rev, completed=completed)
+
+    def delete(self, task_id, expected_rev=None):
+        """Remove one task by id"""
+        with self._transaction():
+            try:
+                todo = self._current(task_id, expected_rev)
+            except KeyError:
+                return
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self._log_changes([(task_id, "delete")])
+            with self._lock:
+                del self._tasks[task_id]
+                self.index.remove(todo)
+                self.text_index.remove(todo)
+                self.stats.remove(todo)
+
+    def bulk_delete(self, task_ids):
+        """Remove many tasks in one transaction; return how many were deleted"""
+        with self._transaction():
+            todos = [self._tasks[task_id] for task_id in dict.fromkeys(task_ids) if task_id in self._tasks]
+            if not todos:
+                return 0
+            self._conn.executemany("DELETE FROM tasks WHERE id = ?", [(todo.id,) for todo in todos])
+            self._log_changes([(todo.id, "delete") for todo in todos])
+            with self._lock:
+                for todo in todos:
+                    del self._tasks[todo.id]
+                    self.text_index.remove(todo)
+                    self.stats.remove(todo)
+                self.index.remove_many(todos)
+        return len(todos)
+
+    def clear(self, expected_version=None):
+        """Delete every task in this list
+
+        With `expected_version`, refuse if the list changed since then.
+        """
+        with self._transaction():
+            if expected_version is not None and self.version != expected_version:
+                raise ConflictError("The task list was changed elsewhere")
+            self._conn.execute("DELETE FROM tasks WHERE list_name = ?", (self.list_name,))
+            self._log_changes([(None, "clear")])
+            with self._lock:
+                self._tasks.clear()
+                self.index.clear()
+                self.text_index.clear()
+                self.stats.clear()
+
+    def close(self):
+        self._conn.close()
+        self._peek_conn.close()